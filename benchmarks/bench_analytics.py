@@ -0,0 +1,124 @@
+"""Отчеты аналитики админа на большой таблице заказов.
+
+Заполняет временную базу SQLite заказами (по умолчанию миллион за 90 дней),
+считает итоги миграцией backfill_analytics и сравнивает время отчетов:
+  итоги  - load_report из database/analytics.py (GROUP BY по item_daily_stats
+           и restaurant_hourly_stats);
+  заказы - тот же отчет одним GROUP BY прямо по таблице orders.
+Время в миллисекундах, лучшее из --repeat запусков.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_analytics --orders 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, func, extract
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import orm
+from database.analytics import PERIODS, REPORTS, load_report, _since
+from database.engine import build_engine
+from database.migrations import prepare_schema, backfill_analytics
+from database.models import MenuItem, Category, MenuGroup, Restaurant, User, Order
+
+RESTAURANTS = 5
+ITEMS = 100  # блюд в ресторане
+USERS = 1000
+DAYS = 90
+CHUNK = 50_000
+
+# --- ТЕ ЖЕ ОТЧЕТЫ ПО ТАБЛИЦЕ ЗАКАЗОВ ---
+def naive_query(report: str, period: str):
+    columns = {
+        "items": (MenuItem.id, MenuItem.name),
+        "categories": (Category.id, Category.name),
+        "restaurants": (Restaurant.id, Restaurant.name),
+        "hours": (extract("hour", Order.created),),
+    }[report]
+    query = (
+        select(*columns, func.count(Order.id), func.sum(Order.fixed_price))
+        .join(MenuItem, Order.item_id == MenuItem.id)
+        .join(Category, MenuItem.category_id == Category.id)
+        .join(MenuGroup, Category.group_id == MenuGroup.id)
+        .join(Restaurant, MenuGroup.restaurant_id == Restaurant.id)
+        .group_by(*columns)
+    )
+    since = _since(period)
+    if since:
+        query = query.where(Order.created >= datetime.combine(since, datetime.min.time()))
+    return query
+
+async def naive_report(session, report: str, period: str):
+    return (await session.execute(naive_query(report, period))).all()
+
+async def seed(session_factory, engine, orders: int):
+    async with session_factory() as session:
+        for n in range(RESTAURANTS):
+            rest = await orm.add_restaurant(session, f"Ресторан {n}", "")
+            await orm.sync_menu_items(session, rest.id, [
+                {'Группа': 'Группа', 'Категория': f"Категория {i % 10}", 'Название блюда': f"Блюдо {i}",
+                 'Цена': float(100 + i)}
+                for i in range(ITEMS)
+            ])
+        await session.execute(insert(User), [{"telegram_id": 10_000 + n, "username": f"u{n}"} for n in range(USERS)])
+        await session.commit()
+
+    rng = random.Random(1)
+    now = datetime.now()
+    items = RESTAURANTS * ITEMS
+    async with engine.begin() as conn:
+        for start in range(0, orders, CHUNK):
+            await conn.execute(insert(Order), [
+                {
+                    "user_id": rng.randint(1, USERS), "item_id": (item_id := rng.randint(1, items)), "quantity": 1,
+                    "fixed_price": float(100 + (item_id - 1) % ITEMS),
+                    "created": now - timedelta(seconds=rng.randint(0, DAYS * 86400)),
+                }
+                for _ in range(min(CHUNK, orders - start))
+            ])
+
+async def best_of(repeat: int, run) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await run()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.sqlite3')}", echo=False)
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(prepare_schema)
+
+        started = time.perf_counter()
+        await seed(session_factory, engine, args.orders)
+        print(f"заказов: {args.orders}, заполнение {time.perf_counter() - started:.1f} с")
+
+        started = time.perf_counter()
+        async with engine.begin() as conn:
+            await conn.run_sync(backfill_analytics)
+        print(f"backfill_analytics (миграция 3): {time.perf_counter() - started:.1f} с\n")
+
+        print(f"{'отчет':<12} {'период':<7} {'итоги, мс':>10} {'заказы, мс':>11}")
+        async with session_factory() as session:
+            for report in REPORTS:
+                for period in PERIODS:
+                    fast = await best_of(args.repeat, lambda: load_report(session, report, period))
+                    slow = await best_of(args.repeat, lambda: naive_report(session, report, period))
+                    print(f"{report:<12} {period:<7} {fast:>10.1f} {slow:>11.1f}")
+        await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1_000_000, help="заказов в базе")
+    parser.add_argument("--repeat", type=int, default=3, help="запусков каждого отчета")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,287 @@
+"""Нагрузочный прогон диспетчера: синтетические апдейты через Dispatcher.feed_update.
+
+Бот работает с поддельной сессией вместо Telegram API, база - временный SQLite
+с заданным размером меню и истории заказов. На выходе p50/p95/p99 по каждому
+типу апдейта (хендлеру) и апдейтов в секунду; --json сохраняет результат,
+--baseline сравнивает с сохраненным ранее (например, с прогона на другом коммите).
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_dispatcher --items 2000 --users 50 --updates 5000 --json after.json
+    python -m benchmarks.bench_dispatcher --baseline after.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter
+
+# База и токен должны быть заданы до импорта модулей проекта (engine создается при импорте)
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp.name, 'bench.sqlite3')}"
+os.environ.setdefault("BOT_TOKEN", "42:BENCH")
+os.environ["DB_ECHO"] = "0"
+
+import aiogram
+import sqlalchemy
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Update, Message, Chat, User as TgUser, CallbackQuery
+from sqlalchemy import insert, select
+
+from database.engine import create_db, session_maker, engine
+from database.models import User, Order, MenuItem
+from database.orm import add_restaurant, sync_menu_items, backfill_order_rollups
+from database.cache import menu_cache
+from keyboards.inline import MenuCall, StatsCall
+
+TG_ID_BASE = 1_000_000
+
+class FakeSession(BaseSession):
+    """Отвечает вместо Telegram: bool-методам True, остальным - сообщением."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = Counter()
+        self._message_id = 10_000
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method.__returning__ is bool:
+            return True
+        self._message_id += 1
+        chat_id = getattr(method, "chat_id", None) or 0
+        return Message(
+            message_id=self._message_id, date=datetime.datetime.now(),
+            chat=Chat(id=chat_id, type="private"), text="",
+        )
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+# --- ДАННЫЕ ---
+def make_menu(n_items: int, rest_no: int) -> list:
+    return [
+        {'Группа': f"Группа {i % 4}", 'Категория': f"Категория {i % 20}", 'Название блюда': f"Блюдо {rest_no}-{i}",
+         'Состав': "мука, вода, соль", 'Вес': "250 г",
+         'Цена': float(100 + i % 400), 'Калории': float(200 + i % 600),
+         'Белки': float(5 + i % 30), 'Жиры': float(3 + i % 25), 'Углеводы': float(10 + i % 60)}
+        for i in range(n_items)
+    ]
+
+async def seed(n_rests: int, n_items: int, n_users: int, history: int, history_days: int, rnd: random.Random):
+    await create_db()
+    async with session_maker() as session:
+        for r in range(n_rests):
+            rest = await add_restaurant(session, f"Ресторан {r}", "")
+            await sync_menu_items(session, rest.id, make_menu(n_items // n_rests, r))
+
+        await session.execute(insert(User), [
+            {"telegram_id": TG_ID_BASE + n, "username": f"user{n}"} for n in range(n_users)
+        ])
+        user_ids = (await session.execute(select(User.id))).scalars().all()
+        items = (await session.execute(select(MenuItem.id, MenuItem.price))).all()
+
+        # История заказов за последние history_days дней, чтобы статистике было что считать
+        now = datetime.datetime.now()
+        rows = []
+        for user_id in user_ids:
+            for _ in range(history):
+                item_id, price = rnd.choice(items)
+                created = now - datetime.timedelta(days=rnd.randrange(history_days), minutes=rnd.randrange(1440))
+                rows.append({"user_id": user_id, "item_id": item_id, "quantity": 1, "fixed_price": price, "created": created})
+        for start in range(0, len(rows), 5000):
+            await session.execute(insert(Order), rows[start:start + 5000])
+        await session.commit()
+        await backfill_order_rollups(session)
+
+# --- АПДЕЙТЫ ---
+class UpdateFactory:
+    def __init__(self):
+        self._update_id = 0
+
+    def _next_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    def message(self, tg_id: int, text: str) -> Update:
+        return Update(update_id=self._next_id(), message=Message(
+            message_id=self._update_id, date=datetime.datetime.now(),
+            chat=Chat(id=tg_id, type="private"), from_user=TgUser(id=tg_id, is_bot=False, first_name="u"),
+            text=text,
+        ))
+
+    def callback(self, tg_id: int, data: str, message_id: int) -> Update:
+        # Все нажатия пользователя приходят с одного сообщения меню, как в жизни
+        message = Message(
+            message_id=message_id, date=datetime.datetime.now(),
+            chat=Chat(id=tg_id, type="private"), from_user=TgUser(id=1, is_bot=True, first_name="bot"),
+            text="",
+        )
+        return Update(update_id=self._next_id(), callback_query=CallbackQuery(
+            id=str(self._update_id), from_user=TgUser(id=tg_id, is_bot=False, first_name="u"),
+            chat_instance="bench", message=message, data=data,
+        ))
+
+def user_script(factory: UpdateFactory, snap, tg_id: int, count: int, rnd: random.Random) -> list:
+    """Список (метка, апдейт) одного пользователя: заходы в меню с заказами и статистикой."""
+    script = [("start", factory.message(tg_id, "/start"))]
+    menu_message = tg_id  # id сообщения с меню у каждого пользователя свое
+    while len(script) < count:
+        rest = rnd.choice(snap.restaurants)
+        group = rnd.choice(snap.groups_by_rest[rest.id])
+        cat = rnd.choice(snap.cats_by_group[group.id])
+        item = rnd.choice(snap.items_by_cat[cat.id])
+        path = dict(rest_id=rest.id, group_id=group.id, category_id=cat.id)
+
+        script.append(("restaurants", factory.message(tg_id, "🍽 Рестораны")))
+        script.append(("menu_groups", factory.callback(tg_id, MenuCall(level=1, rest_id=rest.id).pack(), menu_message)))
+        script.append(("menu_categories", factory.callback(tg_id, MenuCall(level=2, rest_id=rest.id, group_id=group.id).pack(), menu_message)))
+        script.append(("menu_items", factory.callback(tg_id, MenuCall(level=3, **path).pack(), menu_message)))
+        script.append(("menu_item", factory.callback(tg_id, MenuCall(level=4, item_id=item.id, **path).pack(), menu_message)))
+        for _ in range(rnd.randrange(3)):
+            script.append(("random", factory.callback(tg_id, MenuCall(level=4, action="random", **path).pack(), menu_message)))
+        if rnd.random() < 0.5:
+            script.append(("order", factory.callback(tg_id, MenuCall(level=5, action="order", item_id=item.id, **path).pack(), menu_message)))
+        if rnd.random() < 0.3:
+            script.append(("orders_today", factory.message(tg_id, "🛒 Мои заказы сегодня")))
+        if rnd.random() < 0.2:
+            period = rnd.choice(("week", "month", "all"))
+            script.append(("stats_menu", factory.message(tg_id, "📊 Статистика")))
+            script.append(("stats_text", factory.callback(tg_id, StatsCall(period=period, action="view").pack(), menu_message + 1)))
+            if rnd.random() < 0.2:
+                script.append(("stats_excel", factory.callback(tg_id, StatsCall(period=period, action="excel").pack(), menu_message + 1)))
+    return script[:count]
+
+# --- ПРОГОН ---
+def percentiles(values: list) -> dict:
+    values = sorted(values)
+    if len(values) > 1:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = values[0]
+    return {
+        "count": len(values), "mean_ms": statistics.fmean(values) * 1000,
+        "p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000,
+    }
+
+async def replay(dp, bot, scripts: list) -> tuple:
+    latencies, errors = {}, Counter()
+
+    async def run_user(script):
+        # Апдейты одного чата идут строго по очереди, разные чаты - параллельно
+        for label, update in script:
+            started = time.perf_counter()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception:
+                errors[label] += 1
+            latencies.setdefault(label, []).append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(script) for script in scripts))
+    return latencies, errors, time.perf_counter() - started
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def main(args):
+    rnd = random.Random(args.seed)
+    await seed(args.rests, args.items, args.users, args.history, args.history_days, rnd)
+    snap = await menu_cache.snapshot()
+
+    from main import create_dispatcher
+    dp = create_dispatcher()
+    # Строка лога на каждый апдейт заметно искажает замер
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    fake = FakeSession(args.api_latency_ms / 1000)
+    bot = Bot(os.environ["BOT_TOKEN"], session=fake)
+
+    factory = UpdateFactory()
+    per_user = max(1, args.updates // args.users)
+    scripts = [user_script(factory, snap, TG_ID_BASE + n, per_user, rnd) for n in range(args.users)]
+
+    # Прогрев: кэши меню, пользователей и экранов, первые соединения с базой
+    warmup = [user_script(factory, snap, TG_ID_BASE + n, args.warmup, rnd) for n in range(min(args.users, 5))]
+    await replay(dp, bot, warmup)
+    fake.calls.clear()
+
+    latencies, errors, elapsed = await replay(dp, bot, scripts)
+    await bot.session.close()
+    await engine.dispose()
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "meta": {
+            "commit": git_commit(), "started": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "aiogram": aiogram.__version__, "sqlalchemy": sqlalchemy.__version__,
+            "args": vars(args),
+        },
+        "total": {
+            "updates": total, "seconds": elapsed, "updates_per_sec": total / elapsed,
+            "errors": sum(errors.values()), **percentiles([x for v in latencies.values() for x in v]),
+        },
+        "handlers": {label: {**percentiles(v), "errors": errors[label]} for label, v in sorted(latencies.items())},
+        "api_calls": dict(fake.calls),
+    }
+
+def _delta(new: float, old) -> str:
+    return f" ({new / old * 100 - 100:+.0f}%)" if old else ""
+
+def print_report(report: dict, baseline: dict = None):
+    baseline = baseline or {"total": {}, "handlers": {}}
+    total = report["total"]
+    print(f"коммит: {report['meta']['commit']}   апдейтов: {total['updates']}   ошибок: {total['errors']}")
+    rate = total["updates_per_sec"]
+    print(f"пропускная способность: {rate:.0f} апд/с{_delta(rate, baseline['total'].get('updates_per_sec'))}")
+    print(f"{'хендлер':<16} {'n':>6} {'p50, мс':>14} {'p95, мс':>14} {'p99, мс':>14}")
+    for label, row in report["handlers"].items():
+        old = baseline["handlers"].get(label, {})
+        cells = [f"{row[f]:.2f}{_delta(row[f], old.get(f))}" for f in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"{label:<16} {row['count']:>6} {cells[0]:>14} {cells[1]:>14} {cells[2]:>14}")
+    print("вызовы API:", ", ".join(f"{k}={v}" for k, v in sorted(report["api_calls"].items())))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rests", type=int, default=5, help="ресторанов")
+    parser.add_argument("--items", type=int, default=2000, help="блюд во всех ресторанах")
+    parser.add_argument("--users", type=int, default=50, help="одновременных пользователей")
+    parser.add_argument("--history", type=int, default=200, help="заказов в истории каждого пользователя")
+    parser.add_argument("--history-days", type=int, default=90, help="за сколько дней история")
+    parser.add_argument("--updates", type=int, default=5000, help="апдейтов в замере")
+    parser.add_argument("--warmup", type=int, default=50, help="апдейтов прогрева на пользователя (5 пользователей)")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="задержка ответа поддельного API")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="сохранить результат в файл")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,93 @@
+"""Заказы в час пик: add_orders на каждый заказ отдельно против пачек OrderWriter.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_orders --users 200 --orders 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database.engine import build_engine
+from database.migrations import prepare_schema
+from database.models import User, Order, OrderDailyStat
+from database.orm import add_restaurant, sync_menu_items, add_orders
+from utils.order_writer import OrderWriter
+
+def make_menu(n_items: int) -> list:
+    return [
+        {'Группа': f"Группа {i % 4}", 'Категория': f"Категория {i % 20}", 'Название блюда': f"Блюдо {i}",
+         'Цена': float(100 + i % 400), 'Калории': float(200 + i % 600)}
+        for i in range(n_items)
+    ]
+
+async def setup(url: str, users: int, items: int):
+    engine = build_engine(url, echo=False)
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(prepare_schema)
+    async with session_factory() as session:
+        rest = await add_restaurant(session, "Бенчмарк", "")
+        await sync_menu_items(session, rest.id, make_menu(items))
+        await session.execute(insert(User), [{"telegram_id": 10_000 + n, "username": f"u{n}"} for n in range(users)])
+        await session.commit()
+        user_ids = (await session.execute(select(User.id))).scalars().all()
+    return engine, session_factory, user_ids
+
+async def run(label, user_ids, orders_per_user, item_ids, place):
+    latencies = []
+
+    async def user(user_id):
+        rnd = random.Random(user_id)
+        for _ in range(orders_per_user):
+            started = time.perf_counter()
+            await place(user_id, rnd.choice(item_ids))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(u) for u in user_ids))
+    elapsed = time.perf_counter() - started
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"{label:<26} {len(latencies) / elapsed:>8.0f} заказов/с   p50={cuts[49] * 1000:.1f}мс  p99={cuts[98] * 1000:.1f}мс")
+
+async def check(session_factory, expected: int):
+    async with session_factory() as session:
+        orders = await session.scalar(select(func.count(Order.id)))
+        rolled = await session.scalar(select(func.sum(OrderDailyStat.orders_count)))
+    print(f"{'':<26} записано заказов: {orders} из {expected}, в дневных итогах: {rolled}")
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ("по одному", "OrderWriter"):
+            url = f"sqlite+aiosqlite:///{os.path.join(tmp, label + '.sqlite3')}"
+            engine, session_factory, user_ids = await setup(url, args.users, args.items)
+            item_ids = list(range(1, args.items + 1))
+
+            if label == "по одному":
+                async def place(user_id, item_id):
+                    async with session_factory() as session:
+                        await add_orders(session, [(user_id, item_id, 1)])
+                await run(label, user_ids, args.orders, item_ids, place)
+            else:
+                writer = OrderWriter(session_factory, max_batch=args.batch, max_delay_ms=args.delay_ms)
+                await run(f"{label} ({args.batch} / {args.delay_ms:g}мс)", user_ids, args.orders, item_ids, writer.submit)
+                await writer.drain()
+                print(f"{'':<26} пачек: {writer.batches}, в среднем {writer.written / max(writer.batches, 1):.1f} заказов")
+
+            await check(session_factory, args.users * args.orders)
+            await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200, help="одновременных пользователей")
+    parser.add_argument("--orders", type=int, default=20, help="заказов на пользователя")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=20)
+    asyncio.run(main(parser.parse_args()))
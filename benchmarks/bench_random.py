@@ -0,0 +1,82 @@
+"""Сравнение ORDER BY random() (как рандом работал раньше) с сэмплером по снимку каталога.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_random --items 20000 --picks 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from database.models import Base, Restaurant, MenuGroup, Category, MenuItem
+from database.cache import MenuCache
+from database.sampler import RandomSampler
+
+# Базовая линия: случайное блюдо запросом к базе с сортировкой всей области
+async def get_random_item(session: AsyncSession, restaurant_id: int = None, group_id: int = 0, category_id: int = 0):
+    query = select(MenuItem).options(joinedload(MenuItem.category).joinedload(Category.group)).join(Category).join(MenuGroup).where(
+        MenuItem.is_active == True, Category.is_active == True, MenuGroup.is_active == True
+    )
+    if category_id:
+        query = query.where(MenuItem.category_id == category_id)
+    elif group_id:
+        query = query.where(Category.group_id == group_id)
+    elif restaurant_id:
+        query = query.where(MenuGroup.restaurant_id == restaurant_id)
+    query = query.order_by(func.random()).limit(1)
+    return (await session.execute(query)).scalar()
+
+async def seed(session_factory, n_items: int, n_rests: int = 5, groups_per_rest: int = 4, cats_per_group: int = 10):
+    async with session_factory() as session:
+        await session.execute(insert(Restaurant), [{"name": f"Ресторан {r}", "description": ""} for r in range(n_rests)])
+        await session.execute(insert(MenuGroup), [
+            {"restaurant_id": r + 1, "name": f"Группа {g}"} for r in range(n_rests) for g in range(groups_per_rest)
+        ])
+        n_groups = n_rests * groups_per_rest
+        await session.execute(insert(Category), [
+            {"group_id": g + 1, "name": f"Категория {c}"} for g in range(n_groups) for c in range(cats_per_group)
+        ])
+        n_cats = n_groups * cats_per_group
+        await session.execute(insert(MenuItem), [
+            {"category_id": i % n_cats + 1, "name": f"Блюдо {i}", "price": 100 + i % 500, "calories": 300}
+            for i in range(n_items)
+        ])
+        await session.commit()
+
+async def bench(label, picks, func):
+    started = time.perf_counter()
+    for n in range(picks):
+        await func(n)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {picks / elapsed:>10.0f} выборок/с   {elapsed / picks * 1e6:>9.1f} мкс/выборка")
+
+async def main(n_items: int, picks: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.sqlite3')}")
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await seed(session_factory, n_items)
+
+        print(f"Блюд в меню: {n_items}, выборок: {picks}")
+        for scope, kwargs in [("ресторан", {"restaurant_id": 1}), ("категория", {"category_id": 1}), ("всё меню", {})]:
+            async with session_factory() as session:
+                await bench(f"SQL random() / {scope}", picks, lambda n: get_random_item(session, **kwargs))
+
+            sampler = RandomSampler(cache=MenuCache(session_factory))
+            await sampler.cache.snapshot()  # первая сборка снимка не входит в замер
+            await bench(f"сэмплер / {scope}", picks, lambda n: sampler.pick(n % 100, **kwargs))
+
+        await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--picks", type=int, default=1_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.picks))
@@ -0,0 +1,60 @@
+"""Inline-поиск по меню: сборка индекса и время ответа на запросы.
+
+Снимок меню синтетический (без базы), размер задается --items.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_search --items 50000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from database.cache import MenuSnapshot, RestaurantView, GroupView, CategoryView, ItemView
+from database.search import SearchIndex
+
+DISHES = ["Борщ", "Щи", "Солянка", "Цезарь", "Оливье", "Плов", "Пельмени", "Блины", "Сырники",
+          "Котлета", "Паста карбонара", "Пицца маргарита", "Том ям", "Рамен", "Шаурма", "Бургер"]
+WORDS = ["с курицей", "с говядиной", "домашний", "острый", "по-киевски", "с грибами", "с сыром", "вегетарианский"]
+INGREDIENTS = ["свекла", "капуста", "картофель", "курица", "говядина", "сыр", "томаты", "сметана", "лук", "грибы"]
+QUERIES = ["борщ", "борш", "цезарь с курицей", "пельм", "бл", "сыр", "том ям", "котлета по киевски", "грибы", "xyz"]
+
+def make_snapshot(n_items: int, rnd: random.Random) -> MenuSnapshot:
+    rests = [RestaurantView(r + 1, f"Ресторан {r}", "") for r in range(10)]
+    groups = [GroupView(g + 1, g % 10 + 1, f"Группа {g}") for g in range(40)]
+    cats = [CategoryView(c + 1, c % 40 + 1, f"Категория {c}") for c in range(400)]
+    items = []
+    for i in range(n_items):
+        cat = cats[i % len(cats)]
+        group = groups[cat.group_id - 1]
+        items.append(ItemView(
+            id=i + 1, category_id=cat.id, group_id=group.id, restaurant_id=group.restaurant_id,
+            name=f"{rnd.choice(DISHES)} {rnd.choice(WORDS)} №{i}",
+            composition=", ".join(rnd.sample(INGREDIENTS, 4)), weight="300 г",
+            calories=300, proteins=10, fats=10, carbohydrates=30, price=100 + i % 500,
+        ))
+    return MenuSnapshot(1, rests, groups, cats, items)
+
+def main(n_items: int, repeats: int):
+    snap = make_snapshot(n_items, random.Random(1))
+    started = time.perf_counter()
+    index = SearchIndex(snap)
+    print(f"Блюд: {n_items}, сборка индекса: {(time.perf_counter() - started) * 1000:.0f} мс, "
+          f"триграмм: {len(index.name_grams) + len(index.comp_grams)}")
+
+    print(f"{'запрос':<22} {'найдено':>8} {'p50, мс':>9} {'max, мс':>9}  первый результат")
+    for query in QUERIES:
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            found = index.search(query, limit=50)
+            timings.append((time.perf_counter() - started) * 1000)
+        top = found[0].name if found else "-"
+        print(f"{query:<22} {len(found):>8} {statistics.median(timings):>9.2f} {max(timings):>9.2f}  {top}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    main(args.items, args.repeats)
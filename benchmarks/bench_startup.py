@@ -0,0 +1,158 @@
+"""Холодный старт: время импорта, готовности базы и до первого обработанного апдейта.
+
+Каждый замер - отдельный свежий процесс Python: импорт main, on_startup
+(create_db), затем /start через Dispatcher.feed_update с поддельной сессией
+бота. Первый запуск идет на пустой базе (создание схемы), остальные - на уже
+готовой, как обычный перезапуск.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --importtime 15   # самые медленные импорты
+    python -m benchmarks.bench_startup --max-ms 1500     # проверка для CI
+
+С --max-ms скрипт выходит с кодом 1, если медиана до первого апдейта при
+перезапуске больше порога или к первому апдейту загружен тяжелый модуль.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl")
+
+def child():
+    # Замер внутри свежего процесса; результат - одна JSON-строка в stdout
+    import time
+    started = time.perf_counter()
+
+    import asyncio
+    import datetime
+    import logging
+
+    import main
+    imported = time.perf_counter()
+    logging.disable(logging.INFO)
+
+    from aiogram import Bot
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Update, Message, Chat, User
+
+    answered = []
+
+    class FakeSession(BaseSession):
+        async def make_request(self, bot, method, timeout=None):
+            answered.append(type(method).__name__)
+            if method.__returning__ is bool:
+                return True
+            return Message(message_id=1, date=datetime.datetime.now(), chat=Chat(id=1, type="private"), text="")
+
+        async def stream_content(self, *args, **kwargs):
+            yield b""
+
+        async def close(self):
+            pass
+
+    async def run():
+        dp = main.create_dispatcher()
+        bot = Bot("42:BENCH", session=FakeSession())
+        await dp.emit_startup(bot=bot, **dp.workflow_data)
+        ready = time.perf_counter()
+        update = Update(update_id=1, message=Message(
+            message_id=1, date=datetime.datetime.now(), chat=Chat(id=1, type="private"),
+            from_user=User(id=1, is_bot=False, first_name="u"), text="/start",
+        ))
+        await dp.feed_update(bot, update)
+        first = time.perf_counter()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        return ready, first
+
+    ready, first = asyncio.run(run())
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "db_ready_ms": (ready - imported) * 1000,
+        "first_update_ms": (first - started) * 1000,
+        "answered": answered,
+        "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+        "startup": main.startup_profile.report(),
+    }, ensure_ascii=False))
+
+def run_child(env: dict, cwd: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+        env=env, cwd=cwd, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def importtime(env: dict, cwd: str, top: int):
+    # -X importtime: собственное и накопленное время каждого модуля в микросекундах
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env, cwd=cwd, capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), int(own), name.strip()))
+    print("\nСамые медленные импорты (накопленное время):")
+    for cumulative, own, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {name:<40} {cumulative / 1000:>8.1f} мс  (свое {own / 1000:.1f} мс)")
+
+def main(args):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "PYTHONPATH": root,
+            "BOT_TOKEN": os.environ.get("BOT_TOKEN", "42:BENCH"),
+            "DB_URL": f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.sqlite3')}",
+            "DB_ECHO": "0",
+        }
+        runs = [run_child(env, tmp) for _ in range(args.runs + 1)]
+
+        first, rest = runs[0], runs[1:]
+        print(f"{'':<24} {'импорт':>10} {'база':>10} {'1-й апдейт':>12}")
+        print(f"{'новая база':<24} {first['import_ms']:>8.0f}мс {first['db_ready_ms']:>8.0f}мс {first['first_update_ms']:>10.0f}мс")
+        if rest:
+            med = {k: statistics.median(r[k] for r in rest) for k in ("import_ms", "db_ready_ms", "first_update_ms")}
+            print(f"{f'перезапуск (медиана {len(rest)})':<24} {med['import_ms']:>8.0f}мс {med['db_ready_ms']:>8.0f}мс {med['first_update_ms']:>10.0f}мс")
+        last = runs[-1]
+        print(f"ответ на /start: {', '.join(last['answered']) or 'нет'}")
+        print(f"тяжелые модули после первого апдейта: {', '.join(last['heavy_modules']) or 'нет'}")
+        print(f"пик RSS: {last['startup']['max_rss_mb']} МБ")
+        print("фазы старта:", ", ".join(f"{k} {v:.0f}мс" for k, v in last["startup"]["phases_ms"].items()))
+
+        if args.importtime:
+            importtime(env, tmp, args.importtime)
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"runs": runs}, f, ensure_ascii=False, indent=2)
+
+        if args.max_ms:
+            failed = []
+            startup = statistics.median(r["first_update_ms"] for r in rest or runs)
+            if startup > args.max_ms:
+                failed.append(f"до первого апдейта {startup:.0f}мс > {args.max_ms:.0f}мс")
+            if last["heavy_modules"]:
+                failed.append(f"тяжелые модули на старте: {', '.join(last['heavy_modules'])}")
+            if failed:
+                print("\nРЕГРЕССИЯ: " + "; ".join(failed))
+                sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="перезапусков на готовой базе")
+    parser.add_argument("--importtime", type=int, default=0, help="показать N самых медленных импортов")
+    parser.add_argument("--json", help="сохранить все замеры в файл")
+    parser.add_argument("--max-ms", type=float, default=0, help="порог до первого апдейта, иначе код 1")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+    else:
+        main(args)
@@ -0,0 +1,126 @@
+"""Накладные расходы Python на частые запросы: select(...) на каждый вызов
+против готовых запросов с bindparam из database/orm.py.
+
+Для каждого запроса два замера в микросекундах на вызов:
+  сборка - построить select(...) (с joinedload) и посчитать ключ кэша
+           компиляции: ровно то, что готовый запрос пропускает;
+  вызов  - session.execute(...) целиком на маленькой базе SQLite,
+           где время самой базы мало и видна доля Python.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_statements --calls 3000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import joinedload
+
+from database import orm
+from database.engine import build_engine
+from database.migrations import prepare_schema
+from database.models import MenuItem, Category, MenuGroup, User, Order, OrderDailyStat
+
+# --- ЗАПРОСЫ "КАК РАНЬШЕ": собираются на каждый вызов ---
+def inline_user(telegram_id):
+    return select(User).where(User.telegram_id == telegram_id), {}
+
+def inline_order_item(item_id):
+    return (
+        select(MenuItem.id, MenuItem.price, MenuItem.calories, MenuItem.proteins, MenuItem.fats,
+               MenuItem.carbohydrates, MenuItem.category_id, MenuGroup.restaurant_id)
+        .join(Category, MenuItem.category_id == Category.id).join(MenuGroup, Category.group_id == MenuGroup.id)
+        .where(MenuItem.id.in_([item_id]))
+    ), {}
+
+def inline_today_orders(user_id):
+    day_start = datetime.combine(date.today(), datetime.min.time())
+    return select(Order).options(joinedload(Order.item)).where(
+        Order.user_id == user_id, Order.created >= day_start, Order.created < day_start + timedelta(days=1)
+    ).order_by(Order.created.desc()), {}
+
+def inline_summary(user_id):
+    start_day = (datetime.now() - timedelta(days=7)).date()
+    return select(*(func.coalesce(func.sum(getattr(OrderDailyStat, f)), 0) for f in orm.ROLLUP_FIELDS)).where(
+        OrderDailyStat.user_id == user_id, OrderDailyStat.day >= start_day
+    ), {}
+
+# --- ГОТОВЫЕ ЗАПРОСЫ ИЗ orm.py: только параметры ---
+def cached_user(telegram_id):
+    return orm._USER_BY_TELEGRAM_ID, {"telegram_id": telegram_id}
+
+def cached_order_item(item_id):
+    return orm._ORDER_ITEMS_IN, {"item_ids": [item_id]}
+
+def cached_today_orders(user_id):
+    day_start = datetime.combine(date.today(), datetime.min.time())
+    return orm._TODAY_ORDERS, {"user_id": user_id, "day_start": day_start, "day_end": day_start + timedelta(days=1)}
+
+def cached_summary(user_id):
+    start_day = (datetime.now() - timedelta(days=7)).date()
+    return orm._STATS_SUMMARY_SINCE, {"user_id": user_id, "start_day": start_day}
+
+QUERIES = (
+    ("add_user (select)", inline_user, cached_user, "telegram_id"),
+    ("add_orders (блюда)", inline_order_item, cached_order_item, "item_id"),
+    ("get_today_orders", inline_today_orders, cached_today_orders, "user_id"),
+    ("get_stats_summary", inline_summary, cached_summary, "user_id"),
+)
+
+async def setup(url: str):
+    engine = build_engine(url, echo=False)
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(prepare_schema)
+    async with session_factory() as session:
+        rest = await orm.add_restaurant(session, "Бенчмарк", "")
+        await orm.sync_menu_items(session, rest.id, [
+            {'Группа': 'Группа', 'Категория': f"Категория {i % 5}", 'Название блюда': f"Блюдо {i}", 'Цена': 100.0}
+            for i in range(50)
+        ])
+        await session.execute(insert(User), [{"telegram_id": 10_000 + n, "username": f"u{n}"} for n in range(10)])
+        await session.commit()
+        await orm.add_orders(session, [(1, 1, 1)] * 5)
+    return engine, session_factory
+
+def build_cost(make, calls: int) -> float:
+    started = time.perf_counter()
+    for n in range(calls):
+        stmt, _ = make(n % 10 + 1)
+        stmt._generate_cache_key()
+    return (time.perf_counter() - started) / calls * 1e6
+
+async def call_cost(session, make, calls: int, values) -> float:
+    for n in range(min(calls, 200)):  # прогрев кэша компиляции
+        stmt, params = make(values[n % len(values)])
+        (await session.execute(stmt, params)).all()
+    started = time.perf_counter()
+    for n in range(calls):
+        stmt, params = make(values[n % len(values)])
+        (await session.execute(stmt, params)).all()
+    return (time.perf_counter() - started) / calls * 1e6
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, session_factory = await setup(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.sqlite3')}")
+        values = {"telegram_id": [10_000 + n for n in range(10)], "item_id": list(range(1, 51)), "user_id": [1]}
+        print(f"{'запрос':<22} {'сборка, мкс':>22} {'вызов, мкс':>24}")
+        print(f"{'':<22} {'было':>10} {'стало':>10}   {'было':>10} {'стало':>10}")
+        async with session_factory() as session:
+            for name, inline, cached, kind in QUERIES:
+                build_old, build_new = build_cost(inline, args.calls), build_cost(cached, args.calls)
+                call_old = await call_cost(session, inline, args.calls, values[kind])
+                call_new = await call_cost(session, cached, args.calls, values[kind])
+                print(f"{name:<22} {build_old:>10.1f} {build_new:>10.1f}   {call_old:>10.1f} {call_new:>10.1f}"
+                      f"  ({(call_new - call_old) / call_old * 100:+.0f}%)")
+        await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=3000, help="вызовов каждого запроса")
+    asyncio.run(main(parser.parse_args()))
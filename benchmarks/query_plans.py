@@ -0,0 +1,96 @@
+"""Проверка планов горячих запросов по заказам через EXPLAIN QUERY PLAN (SQLite).
+
+Запросы должны идти по индексам; полный проход по таблице ("SCAN ...") -
+регрессия, скрипт выходит с кодом 1 (удобно для CI).
+
+Запуск из корня проекта:
+    python -m benchmarks.query_plans
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database.migrations import prepare_schema
+from database.models import Restaurant, MenuGroup, Category, MenuItem, User, Order
+from database.orm import get_today_orders, get_stats_summary, stream_orders_for_export, delete_order
+
+async def _drain(gen):
+    async for _ in gen:
+        pass
+
+HOT_QUERIES = {
+    "get_today_orders": lambda session: get_today_orders(session, 1),
+    "get_stats_summary": lambda session: get_stats_summary(session, 1, 30),
+    "stream_orders_for_export": lambda session: _drain(stream_orders_for_export(session, 1, 30)),
+    "delete_order": lambda session: delete_order(session, 1),
+}
+
+async def _seed(session):
+    await session.execute(insert(Restaurant).values(id=1, name="R"))
+    await session.execute(insert(MenuGroup).values(id=1, restaurant_id=1, name="G"))
+    await session.execute(insert(Category).values(id=1, group_id=1, name="C"))
+    await session.execute(insert(MenuItem).values(id=1, category_id=1, name="I", price=1))
+    await session.execute(insert(User).values(id=1, telegram_id=1))
+    await session.execute(insert(Order).values(id=1, user_id=1, item_id=1, fixed_price=1, created=datetime.now()))
+    await session.commit()
+
+async def collect_plans() -> dict:
+    plans = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'plans.sqlite3')}")
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(prepare_schema)
+        async with session_factory() as session:
+            await _seed(session)
+
+        captured = []
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                captured.append((statement, parameters))
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+
+        for name, run in HOT_QUERIES.items():
+            captured.clear()
+            async with session_factory() as session:
+                await run(session)
+            statements = list(captured)
+            plans[name] = []
+            async with engine.connect() as conn:
+                for statement, parameters in statements:
+                    result = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+                    plans[name].append((statement, [row[-1] for row in result]))
+
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+        await engine.dispose()
+    return plans
+
+def find_full_scans(plans: dict) -> list:
+    problems = []
+    for name, statements in plans.items():
+        for statement, details in statements:
+            for detail in details:
+                if detail.startswith("SCAN "):
+                    problems.append((name, detail, statement))
+    return problems
+
+async def main() -> int:
+    plans = await collect_plans()
+    for name, statements in plans.items():
+        print(f"== {name}")
+        for _, details in statements:
+            for detail in details:
+                print(f"   {detail}")
+
+    problems = find_full_scans(plans)
+    for name, detail, statement in problems:
+        print(f"ПОЛНЫЙ ПРОХОД в {name}: {detail}\n   {statement}", file=sys.stderr)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,111 @@
+from datetime import date, datetime
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import ANALYTICS_CACHE_TTL
+from database.models import Restaurant, MenuGroup, Category, MenuItem, ItemDailyStat, RestaurantHourlyStat
+from database.orm import stats_period_start
+from database.stats_cache import StatsCache
+
+# Отчеты для админа: популярные блюда, категории, рестораны и загрузка по часам.
+# Всё считается GROUP BY по итогам item_daily_stats / restaurant_hourly_stats
+# (их ведут add_orders/delete_order), таблица заказов не читается:
+# время отчета зависит от числа дней и блюд, а не от миллионов заказов.
+# Посчитанные строки живут в кэше ANALYTICS_CACHE_TTL секунд, сортировка
+# и обрезка до топа делаются уже по ним.
+
+PERIODS = {"day": 1, "week": 7, "month": 30, "all": None}
+PERIOD_NAMES = {"day": "сегодня", "week": "неделю", "month": "месяц", "all": "всё время"}
+PERIOD_BUTTONS = {"day": "Сегодня", "week": "Неделя", "month": "Месяц", "all": "Всё время"}
+REPORTS = {"items": "🍔 Блюда", "categories": "📂 Категории", "restaurants": "🏪 Рестораны", "hours": "🕐 Часы"}
+SORTS = {"orders": "заказы", "revenue": "выручка", "check": "средний чек"}
+
+# Отчеты общие для всех админов: в кэше одна "область"
+ANALYTICS_SCOPE = 0
+analytics_cache = StatsCache(ttl=ANALYTICS_CACHE_TTL, max_entries=256)
+
+def _since(period: str):
+    # Те же календарные дни, что и у статистики пользователя
+    start = stats_period_start(PERIODS[period])
+    return start.date() if start else None
+
+def _by_item(since):
+    query = select(
+        ItemDailyStat.item_id,
+        func.sum(ItemDailyStat.orders_count).label("orders"),
+        func.sum(ItemDailyStat.revenue).label("revenue"),
+    )
+    if since:
+        query = query.where(ItemDailyStat.day >= since)
+    return query.group_by(ItemDailyStat.item_id).subquery()
+
+def _by_restaurant_hour(since, column):
+    query = select(
+        column.label("key"),
+        func.sum(RestaurantHourlyStat.orders_count).label("orders"),
+        func.sum(RestaurantHourlyStat.revenue).label("revenue"),
+    )
+    if since:
+        query = query.where(RestaurantHourlyStat.day >= since)
+    return query.group_by(column).subquery()
+
+async def load_report(session: AsyncSession, report: str, period: str) -> dict:
+    """{"rows": [(название, заказы, выручка), ...], "at": когда посчитано}."""
+    since = _since(period)
+    if report == "items":
+        # Сначала сворачиваем итоги до блюда, потом подтягиваем названия
+        totals = _by_item(since)
+        query = (
+            select(MenuItem.name, Restaurant.name, totals.c.orders, totals.c.revenue)
+            .select_from(totals)
+            .join(MenuItem, MenuItem.id == totals.c.item_id)
+            .join(Category, MenuItem.category_id == Category.id)
+            .join(MenuGroup, Category.group_id == MenuGroup.id)
+            .join(Restaurant, MenuGroup.restaurant_id == Restaurant.id)
+        )
+        rows = [(f"{item} ({rest})", orders, revenue) for item, rest, orders, revenue in await session.execute(query)]
+    elif report == "categories":
+        totals = _by_item(since)
+        query = (
+            select(Category.name, Restaurant.name, func.sum(totals.c.orders), func.sum(totals.c.revenue))
+            .select_from(totals)
+            .join(MenuItem, MenuItem.id == totals.c.item_id)
+            .join(Category, MenuItem.category_id == Category.id)
+            .join(MenuGroup, Category.group_id == MenuGroup.id)
+            .join(Restaurant, MenuGroup.restaurant_id == Restaurant.id)
+            .group_by(Category.id, Category.name, Restaurant.name)
+        )
+        rows = [(f"{cat} ({rest})", orders, revenue) for cat, rest, orders, revenue in await session.execute(query)]
+    elif report == "restaurants":
+        totals = _by_restaurant_hour(since, RestaurantHourlyStat.restaurant_id)
+        query = (
+            select(Restaurant.name, totals.c.orders, totals.c.revenue)
+            .select_from(totals).join(Restaurant, Restaurant.id == totals.c.key)
+        )
+        rows = [tuple(row) for row in await session.execute(query)]
+    elif report == "hours":
+        totals = _by_restaurant_hour(since, RestaurantHourlyStat.hour)
+        found = {hour: (orders, revenue) for hour, orders, revenue in await session.execute(select(totals))}
+        # Все 24 часа по порядку, пустые - нулями
+        rows = [(f"{hour:02d}:00", *found.get(hour, (0, 0.0))) for hour in range(24)]
+    else:
+        raise ValueError(f"Неизвестный отчет: {report}")
+    return {"rows": rows, "at": datetime.now()}
+
+async def get_report(get_session, report: str, period: str) -> dict:
+    # get_session() вызывается только при промахе кэша
+    return await analytics_cache.get(
+        ANALYTICS_SCOPE, (report, period, date.today()),
+        lambda: load_report(get_session(), report, period),
+    )
+
+def refresh():
+    analytics_cache.invalidate_user(ANALYTICS_SCOPE)
+
+def sort_rows(rows: list, sort: str) -> list:
+    if sort == "revenue":
+        return sorted(rows, key=lambda r: r[2], reverse=True)
+    if sort == "check":
+        return sorted(rows, key=lambda r: r[2] / r[1] if r[1] else 0, reverse=True)
+    return sorted(rows, key=lambda r: r[1], reverse=True)
@@ -0,0 +1,16 @@
+import asyncio
+
+from database.engine import create_db, session_maker
+from database.orm import backfill_order_rollups
+
+# Заполнить дневные итоги заказов и итоги аналитики админа по уже существующим заказам:
+#     python -m database.backfill
+
+async def main():
+    await create_db()
+    async with session_maker() as session:
+        count = await backfill_order_rollups(session)
+    print(f"Дневных итогов пересчитано: {count}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
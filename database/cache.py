@@ -0,0 +1,240 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from config import MENU_VERSION_POLL
+from database.engine import session_maker
+from database.models import Restaurant, MenuGroup, Category, MenuItem, CacheVersion
+
+logger = logging.getLogger(__name__)
+
+# Кэш каталога меню: ресторан -> группа -> категория -> блюдо.
+# Меню меняется только при загрузке файла админом, поэтому навигация читает
+# из снимка в памяти, а в базу ходим только после инвалидации.
+# Загрузка меню поднимает версию "menu" в cache_versions. Процесс, который
+# загружал, сбрасывает кэш сразу; остальные воркеры (WEBHOOK_WORKERS > 1)
+# раз в MENU_VERSION_POLL секунд читают эту версию и сбрасывают свой кэш,
+# если она сменилась. Экраны, поиск, комбо и веса рандома привязаны к
+# menu_cache.version и пересобираются вслед за ним.
+
+MENU_VERSION_KEY = "menu"
+_MENU_VERSION = select(CacheVersion.version).where(CacheVersion.name == MENU_VERSION_KEY)
+
+@dataclass(frozen=True, slots=True)
+class RestaurantView:
+    id: int
+    name: str
+    description: str
+
+@dataclass(frozen=True, slots=True)
+class GroupView:
+    id: int
+    restaurant_id: int
+    name: str
+
+@dataclass(frozen=True, slots=True)
+class CategoryView:
+    id: int
+    group_id: int
+    name: str
+
+@dataclass(frozen=True, slots=True)
+class ItemView:
+    id: int
+    category_id: int
+    group_id: int
+    restaurant_id: int
+    name: str
+    composition: str
+    weight: str
+    calories: float
+    proteins: float
+    fats: float
+    carbohydrates: float
+    price: float
+
+class MenuSnapshot:
+    """Неизменяемый снимок всего меню. Заменяется целиком, а не правится на месте."""
+
+    def __init__(self, version: int, restaurants, groups, categories, items):
+        self.version = version
+        self.restaurants = tuple(restaurants)
+        self.groups = {g.id: g for g in groups}
+        self.categories = {c.id: c for c in categories}
+        self.items = {i.id: i for i in items}
+
+        groups_by_rest, cats_by_group, items_by_cat = {}, {}, {}
+        for g in groups:
+            groups_by_rest.setdefault(g.restaurant_id, []).append(g)
+        for c in categories:
+            cats_by_group.setdefault(c.group_id, []).append(c)
+        for i in items:
+            items_by_cat.setdefault(i.category_id, []).append(i)
+
+        self.groups_by_rest = {k: tuple(v) for k, v in groups_by_rest.items()}
+        self.cats_by_group = {k: tuple(v) for k, v in cats_by_group.items()}
+        self.items_by_cat = {k: tuple(v) for k, v in items_by_cat.items()}
+
+        # Массивы id для случайного выбора за O(1) (см. database/sampler.py)
+        ids_by_rest, ids_by_group = {}, {}
+        for i in items:
+            ids_by_rest.setdefault(i.restaurant_id, []).append(i.id)
+            ids_by_group.setdefault(i.group_id, []).append(i.id)
+        self.ids_by_rest = {k: tuple(v) for k, v in ids_by_rest.items()}
+        self.ids_by_group = {k: tuple(v) for k, v in ids_by_group.items()}
+        self.ids_by_cat = {k: tuple(i.id for i in v) for k, v in self.items_by_cat.items()}
+        self.all_ids = tuple(self.items)
+
+async def load_snapshot(session, version: int) -> MenuSnapshot:
+    # Четыре плоских запроса вместо обхода связей
+    rests = (await session.execute(
+        select(Restaurant).where(Restaurant.is_active == True).order_by(Restaurant.id)
+    )).scalars().all()
+    # Скрытые при повторной загрузке меню группы, категории и блюда не показываем
+    groups = (await session.execute(
+        select(MenuGroup).where(MenuGroup.is_active == True).order_by(MenuGroup.id)
+    )).scalars().all()
+    cats = (await session.execute(
+        select(Category).where(Category.is_active == True).order_by(Category.id)
+    )).scalars().all()
+    items = (await session.execute(
+        select(MenuItem).where(MenuItem.is_active == True).order_by(MenuItem.id)
+    )).scalars().all()
+
+    group_views = [GroupView(g.id, g.restaurant_id, g.name) for g in groups]
+    cat_views = [CategoryView(c.id, c.group_id, c.name) for c in cats]
+
+    # Денормализуем путь до ресторана, чтобы карточке блюда не нужны были связи
+    group_rest = {g.id: g.restaurant_id for g in group_views}
+    cat_group = {c.id: c.group_id for c in cat_views}
+    item_views = []
+    for i in items:
+        group_id = cat_group.get(i.category_id)
+        if group_id is None or group_id not in group_rest:
+            continue
+        item_views.append(ItemView(
+            id=i.id, category_id=i.category_id, group_id=group_id, restaurant_id=group_rest[group_id],
+            name=i.name, composition=i.composition, weight=i.weight,
+            calories=i.calories, proteins=i.proteins, fats=i.fats, carbohydrates=i.carbohydrates,
+            price=i.price,
+        ))
+
+    return MenuSnapshot(
+        version,
+        [RestaurantView(r.id, r.name, r.description) for r in rests],
+        group_views, cat_views, item_views,
+    )
+
+class MenuCache:
+    """Read-through кэш каталога на весь процесс."""
+
+    def __init__(self, session_factory=session_maker, poll_interval: float = MENU_VERSION_POLL):
+        self._session_factory = session_factory
+        self.poll_interval = poll_interval
+        self._snapshot = None
+        self._version = 0
+        self._db_version = None  # версия меню в базе, с которой сверялись последний раз
+        self._watcher = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.polls = 0
+        self.remote_invalidations = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self, db_version: int = None):
+        # Новая версия; старый снимок дочитают те, кто его уже получил.
+        # db_version - версия в базе после своей загрузки меню: сверка с базой
+        # ее уже не примет за чужую и не сбросит кэш второй раз
+        self._version += 1
+        self._snapshot = None
+        if db_version is not None:
+            self._db_version = db_version
+
+    async def snapshot(self) -> MenuSnapshot:
+        snap = self._snapshot
+        if snap is not None and snap.version == self._version:
+            self.hits += 1
+            return snap
+
+        async with self._lock:
+            # Пока ждали лок, снимок мог собрать кто-то другой
+            snap = self._snapshot
+            if snap is not None and snap.version == self._version:
+                self.hits += 1
+                return snap
+
+            self.misses += 1
+            version = self._version
+            async with self._session_factory() as session:
+                db_version = (await session.execute(_MENU_VERSION)).scalar() or 0
+                snap = await load_snapshot(session, version)
+            # Если за время загрузки меню снова поменяли, снимок не сохраняем
+            if version == self._version:
+                self._snapshot = snap
+                self._db_version = db_version
+            return snap
+
+    # --- СВЕРКА С БАЗОЙ ---
+    async def check(self) -> bool:
+        """Сбрасывает кэш, если меню в базе поменял другой процесс. True - сбросили."""
+        async with self._session_factory() as session:
+            db_version = (await session.execute(_MENU_VERSION)).scalar() or 0
+        self.polls += 1
+        changed = self._db_version is not None and db_version != self._db_version
+        self._db_version = db_version
+        if changed:
+            self.remote_invalidations += 1
+            self.invalidate()
+        return changed
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.check()
+            except Exception:
+                # База недоступна - сверимся в следующий раз, навигация работает из снимка
+                logger.exception("Не удалось сверить версию меню")
+
+    def start_watch(self):
+        if self.poll_interval > 0 and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop_watch(self):
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.cancel()
+            try:
+                await watcher
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits, "misses": self.misses, "version": self._version,
+            "polls": self.polls, "remote_invalidations": self.remote_invalidations,
+        }
+
+    # --- ЧТЕНИЕ ---
+    async def get_restaurants(self):
+        return (await self.snapshot()).restaurants
+
+    async def get_groups(self, restaurant_id: int):
+        return (await self.snapshot()).groups_by_rest.get(restaurant_id, ())
+
+    async def get_categories(self, group_id: int):
+        return (await self.snapshot()).cats_by_group.get(group_id, ())
+
+    async def get_items_by_category(self, category_id: int):
+        return (await self.snapshot()).items_by_cat.get(category_id, ())
+
+    async def get_item(self, item_id: int):
+        return (await self.snapshot()).items.get(item_id)
+
+menu_cache = MenuCache()
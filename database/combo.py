@@ -0,0 +1,127 @@
+from collections import OrderedDict
+
+from config import COMBO_CANDIDATES, COMBO_KCAL_MIN, COMBO_KCAL_MAX, COMBO_PROTEIN_MIN
+from database.cache import menu_cache
+
+# "🎲 Собери обед": комбо из нескольких слотов (основное + гарнир/салат + напиток),
+# которое влезает в бюджет и попадает в коридор калорий и белка.
+# Для ресторана один раз собираются numpy-массивы цен/ккал/белков по слотам,
+# дальше каждый выбор (и "другой вариант") - это одна векторная выборка
+# COMBO_CANDIDATES случайных комбинаций и фильтр по ограничениям.
+# numpy импортируется при первом обеде, а не на старте бота.
+
+# Слот -> ключевые слова в названии категории или группы
+COMBO_SLOTS = (
+    ("🍲 Основное", ("горяч", "основн", "втор", "суп", "паст", "пицц", "бургер", "гриль", "мяс", "рыб", "блюд")),
+    ("🥗 Гарнир / салат", ("гарнир", "салат", "закуск", "овощ")),
+    ("🥤 Напиток", ("напит", "чай", "кофе", "сок", "морс", "лимонад", "вода")),
+)
+
+def _slot_of(category, group) -> int:
+    # Сначала по категории ("Салаты" в группе "Основные блюда" - это салат), потом по группе
+    for text in (category.name.lower(), group.name.lower()):
+        for slot, (_, keywords) in enumerate(COMBO_SLOTS):
+            if any(word in text for word in keywords):
+                return slot
+    return -1
+
+class ComboArrays:
+    """Колонки блюд ресторана по слотам. Неизменяемы, живут до смены версии меню."""
+
+    def __init__(self, snap, restaurant_id: int):
+        import numpy as np
+
+        self.version = snap.version
+        buckets = {}
+        for group in snap.groups_by_rest.get(restaurant_id, ()):
+            for cat in snap.cats_by_group.get(group.id, ()):
+                slot = _slot_of(cat, group)
+                if slot >= 0:
+                    buckets.setdefault(slot, []).extend(snap.items_by_cat.get(cat.id, ()))
+
+        if not buckets:
+            # Названия категорий ни на что не похожи: слот - каждая группа ресторана (до трех)
+            for slot, group in enumerate(snap.groups_by_rest.get(restaurant_id, ())[:len(COMBO_SLOTS)]):
+                items = [i for cat in snap.cats_by_group.get(group.id, ()) for i in snap.items_by_cat.get(cat.id, ())]
+                if items:
+                    buckets[slot] = items
+            self.titles = [g.name for g in snap.groups_by_rest.get(restaurant_id, ())[:len(COMBO_SLOTS)]]
+        else:
+            self.titles = [title for title, _ in COMBO_SLOTS]
+
+        self.slots = sorted(buckets)
+        self.items = [tuple(buckets[s]) for s in self.slots]
+        self.price = [np.array([i.price or 0 for i in items], dtype=np.float64) for items in self.items]
+        self.kcal = [np.array([i.calories or 0 for i in items], dtype=np.float64) for items in self.items]
+        self.protein = [np.array([i.proteins or 0 for i in items], dtype=np.float64) for items in self.items]
+
+    def __bool__(self):
+        return bool(self.slots)
+
+class ComboComposer:
+    def __init__(self, cache=menu_cache, candidates: int = COMBO_CANDIDATES,
+                 kcal_range=(COMBO_KCAL_MIN, COMBO_KCAL_MAX), protein_min: float = COMBO_PROTEIN_MIN,
+                 max_restaurants: int = 256):
+        self.cache = cache
+        self.candidates = candidates
+        self.kcal_min, self.kcal_max = kcal_range
+        self.protein_min = protein_min
+        self.max_restaurants = max_restaurants
+        self._arrays = OrderedDict()  # restaurant_id -> ComboArrays, LRU
+        self._rng = None
+
+    async def arrays(self, restaurant_id: int) -> ComboArrays:
+        snap = await self.cache.snapshot()
+        arrays = self._arrays.get(restaurant_id)
+        if arrays is None or arrays.version != snap.version:
+            arrays = ComboArrays(snap, restaurant_id)
+            self._arrays[restaurant_id] = arrays
+            if len(self._arrays) > self.max_restaurants:
+                self._arrays.popitem(last=False)
+        else:
+            self._arrays.move_to_end(restaurant_id)
+        return arrays
+
+    def _sample(self, arrays: ComboArrays, budget: float):
+        import numpy as np
+
+        if self._rng is None:
+            self._rng = np.random.default_rng()
+        n = self.candidates
+        # Матрица candidates x слоты: индекс блюда в каждом слоте
+        picks = [self._rng.integers(0, len(items), n) for items in arrays.items]
+        price = sum(col[idx] for col, idx in zip(arrays.price, picks))
+        kcal = sum(col[idx] for col, idx in zip(arrays.kcal, picks))
+        protein = sum(col[idx] for col, idx in zip(arrays.protein, picks))
+
+        affordable = price <= budget if budget else np.ones(n, dtype=bool)
+        if not affordable.any():
+            return None, False
+        fits = affordable & (kcal >= self.kcal_min) & (kcal <= self.kcal_max) & (protein >= self.protein_min)
+        if fits.any():
+            # Любая подходящая: повторное нажатие дает другой вариант
+            row = self._rng.choice(np.flatnonzero(fits))
+            exact = True
+        else:
+            # Ничего не попало в коридор - ближайший по калориям и белку из тех, что по карману
+            miss = (
+                np.maximum(self.kcal_min - kcal, 0) + np.maximum(kcal - self.kcal_max, 0)
+                + 10 * np.maximum(self.protein_min - protein, 0)
+            )
+            miss[~affordable] = np.inf
+            row = int(np.argmin(miss))
+            exact = False
+        return [int(idx[row]) for idx in picks], exact
+
+    async def compose(self, restaurant_id: int, budget: float = 0):
+        """(список (слот, ItemView), попали ли в коридор) или (None, False)."""
+        arrays = await self.arrays(restaurant_id)
+        if not arrays:
+            return None, False
+        rows, exact = self._sample(arrays, budget)
+        if rows is None:
+            return None, False
+        combo = [(arrays.titles[slot], items[row]) for slot, items, row in zip(arrays.slots, arrays.items, rows)]
+        return combo, exact
+
+combo_composer = ComboComposer()
@@ -1,21 +1,80 @@
-import os
+from contextlib import asynccontextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config import (
+    DB_URL, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE,
+    DB_STATEMENT_CACHE_SIZE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE,
+)
 from database.models import Base
+from database.migrations import prepare_schema
+from database.instrumentation import instrument_engine
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL: читатели не ждут писателя; NORMAL: fsync только на чекпоинтах WAL
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
 
-# Пока используем SQLite (файл db.sqlite3 создастся сам)
-# В будущем здесь будет проверка: если на сервере -> подключаем Postgres
-DB_URL = "sqlite+aiosqlite:///db.sqlite3"
+def build_engine(url: str = DB_URL, echo: bool = DB_ECHO):
+    backend = make_url(url).get_backend_name()
 
-engine = create_async_engine(DB_URL, echo=True)
+    if backend == "postgresql":
+        # Пул соединений: SQLite упирается в одного писателя, Postgres - нет
+        return create_async_engine(
+            url,
+            echo=echo,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            pool_recycle=DB_POOL_RECYCLE,
+            connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+        )
+
+    engine = create_async_engine(url, echo=echo)
+    if backend == "sqlite":
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+engine = build_engine()
+# Время запросов и занятость пула для /metrics (utils/metrics.py)
+instrument_engine(engine)
 
 session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
-# Функция создания таблиц (запустим её при старте бота)
+# Сессия, commit которой в SQLite ждет fsync. При synchronous=NORMAL commit в WAL
+# не синкается и после отключения питания может пропасть, поэтому на время
+# сессии соединение переводится в FULL и потом возвращается в NORMAL.
+# Сессия держит это соединение до конца, чтобы FULL не ушел в пул.
+# В PostgreSQL commit и так durable (synchronous_commit = on).
+@asynccontextmanager
+async def durable_session(factory=session_maker):
+    bind = factory.kw["bind"]
+    if bind.dialect.name != "sqlite":
+        async with factory() as session:
+            yield session
+        return
+    async with bind.connect() as conn:
+        await conn.exec_driver_sql("PRAGMA synchronous=FULL")
+        await conn.commit()
+        try:
+            async with factory(bind=conn) as session:
+                yield session
+        finally:
+            await conn.exec_driver_sql("PRAGMA synchronous=NORMAL")
+            await conn.commit()
+
+# Функция создания таблиц и применения миграций (запустим её при старте бота)
 async def create_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(prepare_schema)
 
 # Функция удаления таблиц (понадобится, если захотим сбросить всё)
 async def drop_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.drop_all)
@@ -0,0 +1,59 @@
+import re
+import time
+
+from sqlalchemy import event
+
+from utils.metrics import registry, db_query_seconds, db_query_errors, current_trace
+
+# Хуки SQLAlchemy: время и количество каждого запроса. Метка запроса -
+# тип и главная таблица ("SELECT menu_items"), а не полный текст: так число
+# рядов в /metrics не растет от списков IN (...) и разных параметров.
+
+_TABLE = re.compile(
+    r'^\s*(?:SELECT\b.*?\bFROM|INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)"?',
+    re.IGNORECASE | re.DOTALL,
+)
+_labels_cache = {}
+
+def statement_label(statement: str) -> str:
+    label = _labels_cache.get(statement)
+    if label is None:
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+        match = _TABLE.match(statement)
+        label = f"{verb} {match.group(1)}" if match else verb
+        # Тексты запросов из ORM повторяются, кэш ограничен на случай сырого SQL
+        if len(_labels_cache) < 5000:
+            _labels_cache[statement] = label
+    return label
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    label = statement_label(statement)
+    db_query_seconds.observe(elapsed, statement=label)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_query(label, elapsed)
+
+def _handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+    if context.statement:
+        db_query_errors.inc(statement=statement_label(context.statement))
+
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+    # Занятость пула соединений (у SQLite без пула метрики просто не будет)
+    pool = sync_engine.pool
+    if hasattr(pool, "checkedout"):
+        registry.gauge("bot_db_pool_checked_out", "Соединения, выданные из пула", pool.checkedout)
+        registry.gauge("bot_db_pool_idle", "Свободные соединения в пуле", pool.checkedin)
+        registry.gauge("bot_db_pool_overflow", "Соединения сверх pool_size", pool.overflow)
+        registry.gauge("bot_db_pool_size", "Размер пула", pool.size)
@@ -0,0 +1,110 @@
+import logging
+
+from sqlalchemy import inspect, select, text, insert, delete, func, extract
+
+from database.models import (
+    Base, SchemaVersion, MenuGroup, Category, MenuItem, Order, OrderDailyStat, ItemDailyStat, RestaurantHourlyStat,
+)
+
+logger = logging.getLogger(__name__)
+
+# Версионные миграции для баз, созданных раньше текущей схемы.
+# create_all создает только отсутствующие таблицы, а колонки и индексы
+# в существующих таблицах добавляются здесь. Каждая миграция должна быть
+# идемпотентной: на новой базе create_all уже все создал.
+
+def _add_is_active(conn):
+    inspector = inspect(conn)
+    for model in (MenuGroup, Category, MenuItem):
+        table = model.__tablename__
+        columns = {col["name"] for col in inspector.get_columns(table)}
+        if "is_active" not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN is_active BOOLEAN DEFAULT TRUE"))
+
+def _add_indexes(conn):
+    for model in (MenuGroup, Category, MenuItem, Order):
+        for index in model.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+def backfill_order_daily_stats(conn):
+    # Дневные итоги заказов пользователей заново: INSERT ... SELECT ... GROUP BY.
+    # Поля те же, что ROLLUP_FIELDS в database/orm.py
+    day = func.date(Order.created)
+    source = (
+        select(
+            Order.user_id, day, MenuGroup.restaurant_id,
+            func.count(Order.id), func.sum(Order.fixed_price),
+            func.sum(func.coalesce(MenuItem.calories, 0)), func.sum(func.coalesce(MenuItem.proteins, 0)),
+            func.sum(func.coalesce(MenuItem.fats, 0)), func.sum(func.coalesce(MenuItem.carbohydrates, 0)),
+        )
+        .join(MenuItem, Order.item_id == MenuItem.id)
+        .join(Category, MenuItem.category_id == Category.id)
+        .join(MenuGroup, Category.group_id == MenuGroup.id)
+        .group_by(Order.user_id, day, MenuGroup.restaurant_id)
+    )
+    conn.execute(delete(OrderDailyStat))
+    conn.execute(insert(OrderDailyStat).from_select(
+        ["user_id", "day", "restaurant_id", "orders_count", "spend", "calories", "proteins", "fats", "carbohydrates"],
+        source,
+    ))
+
+def backfill_analytics(conn):
+    # Итоги аналитики заново по всем заказам: два INSERT ... SELECT ... GROUP BY.
+    # conn - синхронное соединение или сессия (python -m database.backfill)
+    day = func.date(Order.created)
+    by_item = (
+        select(day, Order.item_id, func.count(Order.id), func.sum(Order.fixed_price))
+        .group_by(day, Order.item_id)
+    )
+    hour = extract("hour", Order.created)
+    by_restaurant = (
+        select(day, hour, MenuGroup.restaurant_id, func.count(Order.id), func.sum(Order.fixed_price))
+        .join(MenuItem, Order.item_id == MenuItem.id)
+        .join(Category, MenuItem.category_id == Category.id)
+        .join(MenuGroup, Category.group_id == MenuGroup.id)
+        .group_by(day, hour, MenuGroup.restaurant_id)
+    )
+    conn.execute(delete(ItemDailyStat))
+    conn.execute(insert(ItemDailyStat).from_select(["day", "item_id", "orders_count", "revenue"], by_item))
+    conn.execute(delete(RestaurantHourlyStat))
+    conn.execute(insert(RestaurantHourlyStat).from_select(
+        ["day", "hour", "restaurant_id", "orders_count", "revenue"], by_restaurant
+    ))
+
+MIGRATIONS = [
+    (1, "is_active у групп, категорий и блюд", _add_is_active),
+    (2, "индексы orders(user_id, created) и внешних ключей меню", _add_indexes),
+    (3, "итоги по блюдам и часам для аналитики админа", backfill_analytics),
+    (4, "дневные итоги заказов пользователей для экрана статистики", backfill_order_daily_stats),
+]
+
+def _current_version(conn) -> int:
+    return conn.execute(select(SchemaVersion.version).order_by(SchemaVersion.version.desc()).limit(1)).scalar() or 0
+
+def schema_is_current(conn) -> bool:
+    # Все таблицы на месте и последняя миграция применена - create_all не нужен.
+    # Новая таблица в models.py без миграции тоже сюда не пройдет
+    tables = set(inspect(conn).get_table_names())
+    if not set(Base.metadata.tables) <= tables:
+        return False
+    return _current_version(conn) >= MIGRATIONS[-1][0]
+
+def run_migrations(conn) -> list:
+    current = _current_version(conn)
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info("Миграция %s: %s", version, description)
+        migrate(conn)
+        conn.execute(SchemaVersion.__table__.insert().values(version=version, description=description))
+        applied.append(version)
+    return applied
+
+def prepare_schema(conn) -> list:
+    # Синхронная функция для conn.run_sync: таблицы + миграции в одной транзакции.
+    # На обычном перезапуске схема уже актуальна: один запрос вместо проверки каждой таблицы
+    if schema_is_current(conn):
+        return []
+    Base.metadata.create_all(conn)
+    return run_migrations(conn)
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Integer, Float, Boolean, BigInteger, ForeignKey, DateTime, func
+from sqlalchemy import String, Integer, Float, Boolean, BigInteger, ForeignKey, DateTime, Date, UniqueConstraint, Index, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 class Base(DeclarativeBase):
@@ -18,8 +18,10 @@ class MenuGroup(Base):
     __tablename__ = 'menu_groups'
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    restaurant_id: Mapped[int] = mapped_column(ForeignKey('restaurants.id', ondelete='CASCADE'), nullable=False)
+    restaurant_id: Mapped[int] = mapped_column(ForeignKey('restaurants.id', ondelete='CASCADE'), nullable=False, index=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
+    # Группа пропала из нового файла меню -> скрываем, но не удаляем
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     
     restaurant = relationship("Restaurant", backref="groups")
 
@@ -28,8 +30,9 @@ class Category(Base):
     __tablename__ = 'categories'
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    group_id: Mapped[int] = mapped_column(ForeignKey('menu_groups.id', ondelete='CASCADE'), nullable=False)
+    group_id: Mapped[int] = mapped_column(ForeignKey('menu_groups.id', ondelete='CASCADE'), nullable=False, index=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     
     group = relationship("MenuGroup", backref="categories")
 
@@ -38,7 +41,7 @@ class MenuItem(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     # Привязываем товар сразу к Категории (а через нее узнаем Группу и Ресторан)
-    category_id: Mapped[int] = mapped_column(ForeignKey('categories.id', ondelete='CASCADE'), nullable=False)
+    category_id: Mapped[int] = mapped_column(ForeignKey('categories.id', ondelete='CASCADE'), nullable=False, index=True)
     
     name: Mapped[str] = mapped_column(String(150), nullable=False)
     composition: Mapped[str] = mapped_column(String(400), nullable=True)
@@ -49,6 +52,8 @@ class MenuItem(Base):
     fats: Mapped[float] = mapped_column(Float, nullable=True)
     carbohydrates: Mapped[float] = mapped_column(Float, nullable=True)
     price: Mapped[float] = mapped_column(Float, nullable=False)
+    # Снятые с меню блюда не удаляем: на них ссылаются заказы
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
 
     category = relationship("Category", backref="items")
 
@@ -60,6 +65,8 @@ class User(Base):
 
 class Order(Base):
     __tablename__ = 'orders'
+    # Заказы пользователя за период: WHERE user_id = ? AND created >= ? ORDER BY created
+    __table_args__ = (Index('ix_orders_user_created', 'user_id', 'created'),)
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
     item_id: Mapped[int] = mapped_column(ForeignKey('menu_items.id'), nullable=False)
@@ -67,4 +74,67 @@ class Order(Base):
     fixed_price: Mapped[float] = mapped_column(Float, nullable=False) 
     
     item = relationship("MenuItem")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+# Версии схемы, примененные database/migrations.py
+class SchemaVersion(Base):
+    __tablename__ = 'schema_version'
+
+    version: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    description: Mapped[str] = mapped_column(String(200), nullable=False)
+
+# Версии данных, которые каждый процесс держит в памяти (сейчас только "menu").
+# Загрузка меню поднимает версию в своей транзакции, воркеры сверяют ее
+# с кэшем (database/cache.py), так что новое меню видят все процессы.
+class CacheVersion(Base):
+    __tablename__ = 'cache_versions'
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+# Дневные итоги заказов пользователя по ресторанам.
+# Обновляются в той же транзакции, что add_orders/delete_order,
+# чтобы экран статистики суммировал дни, а не все заказы.
+class OrderDailyStat(Base):
+    __tablename__ = 'order_daily_stats'
+    __table_args__ = (UniqueConstraint('user_id', 'day', 'restaurant_id', name='uq_order_daily_stats'),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    day: Mapped[Date] = mapped_column(Date, nullable=False)
+    restaurant_id: Mapped[int] = mapped_column(ForeignKey('restaurants.id'), nullable=False)
+
+    orders_count: Mapped[int] = mapped_column(Integer, default=0)
+    spend: Mapped[float] = mapped_column(Float, default=0)
+    calories: Mapped[float] = mapped_column(Float, default=0)
+    proteins: Mapped[float] = mapped_column(Float, default=0)
+    fats: Mapped[float] = mapped_column(Float, default=0)
+    carbohydrates: Mapped[float] = mapped_column(Float, default=0)
+
+# Итоги для аналитики админа: по блюдам за день и по ресторанам за час.
+# Обновляются вместе с дневными итогами в add_orders/delete_order;
+# отчеты суммируют эти строки GROUP BY и не читают таблицу заказов.
+class ItemDailyStat(Base):
+    __tablename__ = 'item_daily_stats'
+    # Отчет за период: WHERE day >= ? GROUP BY item_id. Отдельного индекса по item_id нет
+    # нарочно: с ним SQLite группирует по нему и читает всю таблицу вместо диапазона дней
+    __table_args__ = (UniqueConstraint('day', 'item_id', name='uq_item_daily_stats'),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    day: Mapped[Date] = mapped_column(Date, nullable=False)
+    item_id: Mapped[int] = mapped_column(ForeignKey('menu_items.id'), nullable=False)
+
+    orders_count: Mapped[int] = mapped_column(Integer, default=0)
+    revenue: Mapped[float] = mapped_column(Float, default=0)
+
+class RestaurantHourlyStat(Base):
+    __tablename__ = 'restaurant_hourly_stats'
+    __table_args__ = (UniqueConstraint('day', 'hour', 'restaurant_id', name='uq_restaurant_hourly_stats'),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    day: Mapped[Date] = mapped_column(Date, nullable=False)
+    hour: Mapped[int] = mapped_column(Integer, nullable=False)
+    restaurant_id: Mapped[int] = mapped_column(ForeignKey('restaurants.id'), nullable=False)
+
+    orders_count: Mapped[int] = mapped_column(Integer, default=0)
+    revenue: Mapped[float] = mapped_column(Float, default=0)
@@ -1,174 +1,460 @@
-from sqlalchemy import select, delete, func
+import logging
+import time
+from sqlalchemy import select, insert, update, delete, func, bindparam
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
-from datetime import date
+from datetime import date, datetime, timedelta
 
-from database.models import Restaurant, MenuGroup, Category, MenuItem, User, Order
+from database.models import (
+    Restaurant, MenuGroup, Category, MenuItem, User, Order, OrderDailyStat, ItemDailyStat, RestaurantHourlyStat,
+    CacheVersion,
+)
+from database.migrations import backfill_order_daily_stats, backfill_analytics
+from database.cache import menu_cache, MENU_VERSION_KEY
+from database.taste import taste_profiles
+from database.stats_cache import stats_cache
+
+logger = logging.getLogger(__name__)
 
 # --- ДОБАВЛЕНИЕ (ДЛЯ АДМИНА) ---
+async def _bump_menu_version(session: AsyncSession) -> int:
+    # В той же транзакции, что и правка меню: другие воркеры увидят новую
+    # версию вместе с новым меню и сбросят свой menu_cache (database/cache.py).
+    # Новую версию возвращаем, чтобы этот процесс не принял свою же загрузку за чужую
+    dialect_insert = _dialect_insert(session)
+    stmt = dialect_insert(CacheVersion).values(name=MENU_VERSION_KEY, version=1)
+    stmt = stmt.on_conflict_do_update(index_elements=["name"], set_={"version": CacheVersion.version + 1})
+    return (await session.execute(stmt.returning(CacheVersion.version))).scalar_one()
+
 async def add_restaurant(session: AsyncSession, name: str, description: str):
     res = await session.execute(select(Restaurant).where(Restaurant.name == name))
     existing = res.scalar()
     if existing:
         existing.description = description
+        db_version = await _bump_menu_version(session)
         await session.commit()
+        menu_cache.invalidate(db_version)
         return existing
     else:
         new_rest = Restaurant(name=name, description=description)
         session.add(new_rest)
+        db_version = await _bump_menu_version(session)
         await session.commit()
+        menu_cache.invalidate(db_version)
         return new_rest
 
-async def add_menu_items(session: AsyncSession, restaurant_id: int, items_data: list):
-    # Очистка старого меню этого ресторана
-    # Удаляем группы (каскадно удалятся категории и блюда)
-    await session.execute(delete(MenuGroup).where(MenuGroup.restaurant_id == restaurant_id))
-    
-    # Словари для кэширования ID, чтобы не делать лишние запросы
-    groups_cache = {} # "Название": id
-    cats_cache = {}   # ("Название", group_id): id
+def _item_values(row: dict, category_id: int) -> dict:
+    # Строка из Excel -> значения колонок MenuItem
+    return {
+        "category_id": category_id,
+        "name": row.get('Название блюда'),
+        "composition": row.get('Состав', ''),
+        "weight": str(row.get('Вес', '')),
+        "calories": row.get('Калории', 0),
+        "proteins": row.get('Белки', 0),
+        "fats": row.get('Жиры', 0),
+        "carbohydrates": row.get('Углеводы', 0),
+        "price": row.get('Цена', 0),
+    }
 
-    for row in items_data:
-        g_name = row.get('Группа', 'Разное')
-        c_name = row.get('Категория', 'Общее')
-        
-        # 1. Работаем с Группой
-        if g_name not in groups_cache:
-            # Создаем группу
-            group = MenuGroup(restaurant_id=restaurant_id, name=g_name)
-            session.add(group)
-            await session.flush() # Чтобы получить ID сразу
-            groups_cache[g_name] = group.id
-        
-        g_id = groups_cache[g_name]
-        
-        # 2. Работаем с Категорией
-        if (c_name, g_id) not in cats_cache:
-            cat = Category(group_id=g_id, name=c_name)
-            session.add(cat)
-            await session.flush()
-            cats_cache[(c_name, g_id)] = cat.id
-            
-        c_id = cats_cache[(c_name, g_id)]
-
-        # 3. Создаем Блюдо
-        new_item = MenuItem(
-            category_id=c_id,
-            name=row.get('Название блюда'),
-            composition=row.get('Состав', ''),
-            weight=str(row.get('Вес', '')),
-            calories=row.get('Калории', 0),
-            proteins=row.get('Белки', 0),
-            fats=row.get('Жиры', 0),
-            carbohydrates=row.get('Углеводы', 0),
-            price=row.get('Цена', 0)
+# Поля блюда, которые сравниваем при повторной загрузке меню
+ITEM_FIELDS = ("composition", "weight", "calories", "proteins", "fats", "carbohydrates", "price")
+
+def _chunks(seq: list, size: int = 500):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+async def _set_active(session: AsyncSession, model, ids: list, value: bool):
+    for chunk in _chunks(ids):
+        await session.execute(update(model).where(model.id.in_(chunk)).values(is_active=value))
+
+async def sync_menu_items(session: AsyncSession, restaurant_id: int, items_data: list) -> dict:
+    # Повторная загрузка меню через дифф: строки сопоставляются с существующими
+    # по естественному ключу (группа, категория, название блюда), и в базу
+    # пишется только разница. id блюд не меняются, заказы не теряют ссылки.
+    # В summary["timings"] - время каждой фазы в секундах.
+    summary = dict.fromkeys((
+        "groups_added", "groups_hidden", "categories_added", "categories_hidden",
+        "items_added", "items_updated", "items_hidden", "items_unchanged",
+    ), 0)
+    timings = {}
+    lap = time.perf_counter()
+
+    def mark(phase):
+        nonlocal lap
+        now = time.perf_counter()
+        timings[phase] = now - lap
+        lap = now
+
+    # 1. Группы
+    res = await session.execute(
+        select(MenuGroup.id, MenuGroup.name, MenuGroup.is_active).where(MenuGroup.restaurant_id == restaurant_id)
+    )
+    old_groups = {name: (g_id, active) for g_id, name, active in res}
+
+    group_names = list(dict.fromkeys(row.get('Группа', 'Разное') for row in items_data))
+    groups_cache = {name: old_groups[name][0] for name in group_names if name in old_groups}
+    new_groups = [name for name in group_names if name not in old_groups]
+    if new_groups:
+        result = await session.execute(
+            insert(MenuGroup).returning(MenuGroup.id, MenuGroup.name),
+            [{"restaurant_id": restaurant_id, "name": name} for name in new_groups]
         )
-        session.add(new_item)
-    
-    await session.commit()
+        groups_cache.update({name: g_id for g_id, name in result})
+    await _set_active(session, MenuGroup, [g_id for name, (g_id, active) in old_groups.items() if name in groups_cache and not active], True)
+    hidden = [g_id for name, (g_id, active) in old_groups.items() if name not in groups_cache and active]
+    await _set_active(session, MenuGroup, hidden, False)
+    summary["groups_added"], summary["groups_hidden"] = len(new_groups), len(hidden)
+    mark("groups")
 
-# --- ПОЛУЧЕНИЕ ДАННЫХ (ДЛЯ ЮЗЕРА) ---
+    # 2. Категории
+    group_ids = select(MenuGroup.id).where(MenuGroup.restaurant_id == restaurant_id)
+    res = await session.execute(
+        select(Category.id, Category.name, Category.group_id, Category.is_active).where(Category.group_id.in_(group_ids))
+    )
+    old_cats = {(name, g_id): (c_id, active) for c_id, name, g_id, active in res}
 
-async def get_restaurants(session: AsyncSession):
-    query = select(Restaurant).where(Restaurant.is_active == True)
-    result = await session.execute(query)
-    return result.scalars().all()
+    cat_keys = list(dict.fromkeys(
+        (row.get('Категория', 'Общее'), groups_cache[row.get('Группа', 'Разное')]) for row in items_data
+    ))
+    cats_cache = {key: old_cats[key][0] for key in cat_keys if key in old_cats}
+    new_cats = [key for key in cat_keys if key not in old_cats]
+    if new_cats:
+        result = await session.execute(
+            insert(Category).returning(Category.id, Category.name, Category.group_id),
+            [{"group_id": g_id, "name": name} for name, g_id in new_cats]
+        )
+        cats_cache.update({(name, g_id): c_id for c_id, name, g_id in result})
+    await _set_active(session, Category, [c_id for key, (c_id, active) in old_cats.items() if key in cats_cache and not active], True)
+    hidden = [c_id for key, (c_id, active) in old_cats.items() if key not in cats_cache and active]
+    await _set_active(session, Category, hidden, False)
+    summary["categories_added"], summary["categories_hidden"] = len(new_cats), len(hidden)
+    mark("categories")
 
-async def get_groups(session: AsyncSession, restaurant_id: int):
-    query = select(MenuGroup).where(MenuGroup.restaurant_id == restaurant_id)
-    result = await session.execute(query)
-    return result.scalars().all()
+    # 3. Блюда. Одноименные блюда в одной категории различаем по порядковому номеру
+    cat_ids = select(Category.id).where(Category.group_id.in_(group_ids))
+    res = await session.execute(
+        select(MenuItem.id, MenuItem.category_id, MenuItem.name, MenuItem.is_active,
+               *(getattr(MenuItem, field) for field in ITEM_FIELDS))
+        .where(MenuItem.category_id.in_(cat_ids)).order_by(MenuItem.id)
+    )
+    old_items = {}
+    seen = {}
+    for row in res:
+        key = (row.category_id, row.name)
+        seen[key] = seen.get(key, 0) + 1
+        old_items[key + (seen[key],)] = row
 
-async def get_categories(session: AsyncSession, group_id: int):
-    query = select(Category).where(Category.group_id == group_id)
-    result = await session.execute(query)
-    return result.scalars().all()
+    to_insert, to_update, matched = [], [], set()
+    seen = {}
+    for row in items_data:
+        g_id = groups_cache[row.get('Группа', 'Разное')]
+        values = _item_values(row, cats_cache[(row.get('Категория', 'Общее'), g_id)])
+        key = (values["category_id"], values["name"])
+        seen[key] = seen.get(key, 0) + 1
+        key += (seen[key],)
 
-async def get_items_by_category(session: AsyncSession, category_id: int):
-    query = select(MenuItem).where(MenuItem.category_id == category_id)
-    result = await session.execute(query)
-    return result.scalars().all()
+        old = old_items.get(key)
+        if old is None:
+            to_insert.append(values)
+            continue
+        matched.add(key)
+        if old.is_active and all(getattr(old, field) == values[field] for field in ITEM_FIELDS):
+            summary["items_unchanged"] += 1
+            continue
+        to_update.append({"id": old.id, "is_active": True, **{field: values[field] for field in ITEM_FIELDS}})
+
+    hidden = [old.id for key, old in old_items.items() if key not in matched and old.is_active]
+
+    if to_insert:
+        await session.execute(insert(MenuItem), to_insert)
+    if to_update:
+        # Bulk UPDATE по первичному ключу: один executemany
+        await session.execute(update(MenuItem), to_update)
+    await _set_active(session, MenuItem, hidden, False)
+    summary["items_added"], summary["items_updated"], summary["items_hidden"] = len(to_insert), len(to_update), len(hidden)
+    changed = any(value for key, value in summary.items() if key != "items_unchanged")
+    if changed:
+        db_version = await _bump_menu_version(session)
+    mark("items")
+
+    await session.commit()
+    mark("commit")
+    if changed:
+        menu_cache.invalidate(db_version)
 
-async def get_item(session: AsyncSession, item_id: int):
-    # Подгружаем сразу категорию и группу, чтобы знать имена для кнопки "Назад"
-    query = select(MenuItem).options(joinedload(MenuItem.category).joinedload(Category.group)).where(MenuItem.id == item_id)
-    result = await session.execute(query)
-    return result.scalar()
-
-# --- РАНДОМ ---
-async def get_random_item(session: AsyncSession, restaurant_id: int = None, group_id: int = 0, category_id: int = 0):
-    query = select(MenuItem).options(joinedload(MenuItem.category).joinedload(Category.group)).join(Category).join(MenuGroup)
-    
-    if category_id:
-        query = query.where(MenuItem.category_id == category_id)
-    elif group_id:
-        query = query.where(Category.group_id == group_id)
-    elif restaurant_id:
-        query = query.where(MenuGroup.restaurant_id == restaurant_id)
-        
-    query = query.order_by(func.random()).limit(1)
-    result = await session.execute(query)
-    return result.scalar()
+    logger.info(
+        "Меню ресторана %s обновлено: %s, %s", restaurant_id, summary,
+        ", ".join(f"{phase}={sec * 1000:.0f}ms" for phase, sec in timings.items())
+    )
+    summary["timings"] = timings
+    return summary
 
 # --- ЮЗЕРЫ И ЗАКАЗЫ ---
+# Меню пользователю отдается из снимка в памяти (database/cache.py), в базу
+# здесь ходят только за пользователями и заказами.
+# Частые запросы собраны один раз при импорте, значения передаются через bindparam.
+# Ключ кэша у готового объекта запоминается, поэтому SQLAlchemy не строит
+# select(...) с joinedload и не считает ключ на каждый вызов, а сразу берет
+# скомпилированный SQL из кэша (см. benchmarks/bench_statements.py).
+_USER_BY_TELEGRAM_ID = select(User).where(User.telegram_id == bindparam("telegram_id"))
+
 async def add_user(session: AsyncSession, telegram_id: int, username: str):
-    query = select(User).where(User.telegram_id == telegram_id)
-    result = await session.execute(query)
+    params = {"telegram_id": telegram_id}
+    result = await session.execute(_USER_BY_TELEGRAM_ID, params)
     user = result.scalar()
     if not user:
         user = User(telegram_id=telegram_id, username=username)
         session.add(user)
-        await session.commit()
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Параллельный апдейт того же пользователя успел его создать
+            await session.rollback()
+            user = (await session.execute(_USER_BY_TELEGRAM_ID, params)).scalar_one()
     return user
 
-async def add_order(session: AsyncSession, telegram_id: int, item_id: int, quantity: int = 1):
-    user_res = await session.execute(select(User).where(User.telegram_id == telegram_id))
-    user = user_res.scalar()
-    if not user:
-        user = User(telegram_id=telegram_id, username="Unknown")
-        session.add(user)
-        await session.flush()
+# --- ДНЕВНЫЕ ИТОГИ ---
+ROLLUP_FIELDS = ("orders_count", "spend", "calories", "proteins", "fats", "carbohydrates")
 
-    item = await session.get(MenuItem, item_id)
-    new_order = Order(user_id=user.id, item_id=item_id, quantity=quantity, fixed_price=item.price)
-    session.add(new_order)
-    await session.commit()
+def _dialect_insert(session: AsyncSession):
+    # INSERT ... ON CONFLICT есть и в SQLite, и в PostgreSQL, но в разных модулях
+    if session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert
 
-async def get_today_orders(session: AsyncSession, telegram_id: int):
-    user_res = await session.execute(select(User).where(User.telegram_id == telegram_id))
-    user = user_res.scalar()
-    if not user: return []
-
-    query = select(Order).options(joinedload(Order.item)).where(
-        Order.user_id == user.id,
-        func.date(Order.created) == date.today()
-    ).order_by(Order.created.desc())
-    
-    result = await session.execute(query)
+def _rollup_values(price, calories, proteins, fats, carbohydrates, sign: int = 1) -> dict:
+    # Считаем так же, как экран статистики: цена заказа + КБЖУ блюда
+    return {
+        "orders_count": sign,
+        "spend": sign * (price or 0),
+        "calories": sign * (calories or 0),
+        "proteins": sign * (proteins or 0),
+        "fats": sign * (fats or 0),
+        "carbohydrates": sign * (carbohydrates or 0),
+    }
+
+async def _subtract_from_rollup(session: AsyncSession, user_id: int, day: date, restaurant_id: int, values: dict):
+    key = (OrderDailyStat.user_id == user_id, OrderDailyStat.day == day, OrderDailyStat.restaurant_id == restaurant_id)
+    await session.execute(
+        update(OrderDailyStat).where(*key)
+        .values({field: getattr(OrderDailyStat, field) - values[field] for field in ROLLUP_FIELDS})
+    )
+    await session.execute(delete(OrderDailyStat).where(*key, OrderDailyStat.orders_count <= 0))
+
+# Итоги аналитики админа: (день, блюдо) и (день, час, ресторан) -> заказы и выручка.
+# rows - словари с ключевыми колонками + orders_count и revenue; один executemany на таблицу
+ANALYTICS_KEYS = {
+    ItemDailyStat: ["day", "item_id"],
+    RestaurantHourlyStat: ["day", "hour", "restaurant_id"],
+}
+
+async def _add_to_analytics(session: AsyncSession, model, rows: list):
+    dialect_insert = _dialect_insert(session)
+    stmt = dialect_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=ANALYTICS_KEYS[model],
+        set_={field: getattr(model, field) + stmt.excluded[field] for field in ("orders_count", "revenue")},
+    )
+    await session.execute(stmt, rows)
+
+async def _subtract_from_analytics(session: AsyncSession, model, key: dict, revenue: float):
+    where = [getattr(model, column) == value for column, value in key.items()]
+    await session.execute(
+        update(model).where(*where)
+        .values(orders_count=model.orders_count - 1, revenue=model.revenue - revenue)
+    )
+    await session.execute(delete(model).where(*where, model.orders_count <= 0))
+
+def _analytics_rows(orders: list) -> tuple:
+    # orders - (время заказа, item_id, ресторан, цена); складываем одинаковые ключи в памяти
+    by_item, by_hour = {}, {}
+    for created, item_id, restaurant_id, price in orders:
+        for rows, key in ((by_item, (created.date(), item_id)), (by_hour, (created.date(), created.hour, restaurant_id))):
+            total = rows.get(key)
+            if total is None:
+                rows[key] = [1, price or 0]
+            else:
+                total[0] += 1
+                total[1] += price or 0
+    return (
+        [{"day": day, "item_id": item_id, "orders_count": n, "revenue": revenue}
+         for (day, item_id), (n, revenue) in by_item.items()],
+        [{"day": day, "hour": hour, "restaurant_id": restaurant_id, "orders_count": n, "revenue": revenue}
+         for (day, hour, restaurant_id), (n, revenue) in by_hour.items()],
+    )
+
+async def _add_orders_to_analytics(session: AsyncSession, orders: list):
+    by_item, by_hour = _analytics_rows(orders)
+    await _add_to_analytics(session, ItemDailyStat, by_item)
+    await _add_to_analytics(session, RestaurantHourlyStat, by_hour)
+
+# Цена, КБЖУ и ресторан блюда одним запросом (ресторан нужен для дневных итогов)
+_ORDER_ITEMS = (
+    select(MenuItem.id, MenuItem.price, MenuItem.calories, MenuItem.proteins, MenuItem.fats,
+           MenuItem.carbohydrates, MenuItem.category_id, MenuGroup.restaurant_id)
+    .join(Category, MenuItem.category_id == Category.id).join(MenuGroup, Category.group_id == MenuGroup.id)
+)
+_ORDER_ITEMS_IN = _ORDER_ITEMS.where(MenuItem.id.in_(bindparam("item_ids", expanding=True)))
+
+# Пачка заказов одной транзакцией (см. utils/order_writer.py): один SELECT блюд,
+# один INSERT заказов, один upsert дневных итогов и один commit на всю пачку.
+# Единственный путь записи в orders. orders - список (user_id, item_id, quantity),
+# user_id - внутренний users.id, не telegram_id; возвращает список флагов
+# "записан" в том же порядке (False - блюда с таким id нет).
+async def add_orders(session: AsyncSession, orders: list) -> list:
+    item_ids = list({item_id for _, item_id, _ in orders})
+    rows = await session.execute(_ORDER_ITEMS_IN, {"item_ids": item_ids})
+    items = {row.id: row for row in rows}
+
+    now = datetime.now()
+    order_rows, rollups, written = [], {}, []
+    for user_id, item_id, quantity in orders:
+        item = items.get(item_id)
+        written.append(item is not None)
+        if item is None:
+            continue
+        order_rows.append({
+            "user_id": user_id, "item_id": item_id, "quantity": quantity,
+            "fixed_price": item.price, "created": now,
+        })
+        # Итоги складываем в памяти: одна строка upsert на (пользователь, день, ресторан)
+        key = (user_id, now.date(), item.restaurant_id)
+        values = _rollup_values(item.price, item.calories, item.proteins, item.fats, item.carbohydrates)
+        total = rollups.get(key)
+        if total is None:
+            rollups[key] = values
+        else:
+            for field in ROLLUP_FIELDS:
+                total[field] += values[field]
+
+    if order_rows:
+        await session.execute(insert(Order), order_rows)
+        dialect_insert = _dialect_insert(session)
+        stmt = dialect_insert(OrderDailyStat)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "day", "restaurant_id"],
+            set_={field: getattr(OrderDailyStat, field) + stmt.excluded[field] for field in ROLLUP_FIELDS},
+        )
+        await session.execute(stmt, [
+            {"user_id": user_id, "day": day, "restaurant_id": restaurant_id, **values}
+            for (user_id, day, restaurant_id), values in rollups.items()
+        ])
+        await _add_orders_to_analytics(session, [
+            (now, row["item_id"], items[row["item_id"]].restaurant_id, row["fixed_price"]) for row in order_rows
+        ])
+        await session.commit()
+        for row in order_rows:
+            item = items[row["item_id"]]
+            taste_profiles.order_added(row["user_id"], item.id, item.category_id, item.calories, now)
+        for user_id in {row["user_id"] for row in order_rows}:
+            stats_cache.invalidate_user(user_id)
+    return written
+
+# Полуоткрытый интервал [полночь; следующая полночь) использует индекс (user_id, created),
+# в отличие от func.date(created) == today
+_TODAY_ORDERS = select(Order).options(joinedload(Order.item)).where(
+    Order.user_id == bindparam("user_id"),
+    Order.created >= bindparam("day_start"),
+    Order.created < bindparam("day_end")
+).order_by(Order.created.desc())
+
+async def get_today_orders(session: AsyncSession, user_id: int):
+    day_start = datetime.combine(date.today(), datetime.min.time())
+    result = await session.execute(
+        _TODAY_ORDERS, {"user_id": user_id, "day_start": day_start, "day_end": day_start + timedelta(days=1)}
+    )
     return result.scalars().all()
 
-async def delete_order(session: AsyncSession, order_id: int):
-    await session.execute(delete(Order).where(Order.id == order_id))
+# Блюдо могло пропасть из меню при полной замене, поэтому outer join
+_ORDER_FOR_DELETE = (
+    select(Order.user_id, Order.item_id, Order.created, Order.fixed_price, MenuItem.category_id,
+           MenuItem.calories, MenuItem.proteins, MenuItem.fats, MenuItem.carbohydrates, MenuGroup.restaurant_id)
+    .outerjoin(MenuItem, Order.item_id == MenuItem.id)
+    .outerjoin(Category, MenuItem.category_id == Category.id)
+    .outerjoin(MenuGroup, Category.group_id == MenuGroup.id)
+    .where(Order.id == bindparam("order_id"))
+)
+_DELETE_ORDER = delete(Order).where(Order.id == bindparam("order_id"))
+
+# user_id: удалить можно только свой заказ
+async def delete_order(session: AsyncSession, order_id: int, user_id: int = None):
+    params = {"order_id": order_id}
+    order = (await session.execute(_ORDER_FOR_DELETE, params)).first()
+    if order is None or (user_id is not None and order.user_id != user_id):
+        return
+
+    await session.execute(_DELETE_ORDER, params)
+    if order.restaurant_id is not None:
+        await _subtract_from_rollup(
+            session, order.user_id, order.created.date(), order.restaurant_id,
+            _rollup_values(order.fixed_price, order.calories, order.proteins, order.fats, order.carbohydrates)
+        )
+        await _subtract_from_analytics(
+            session, RestaurantHourlyStat,
+            {"day": order.created.date(), "hour": order.created.hour, "restaurant_id": order.restaurant_id},
+            order.fixed_price or 0,
+        )
+    await _subtract_from_analytics(
+        session, ItemDailyStat, {"day": order.created.date(), "item_id": order.item_id}, order.fixed_price or 0
+    )
     await session.commit()
+    taste_profiles.order_deleted(order.user_id, order.item_id, order.category_id, order.created)
+    stats_cache.invalidate_user(order.user_id)
+
+# Начало периода статистики: полночь первого из days календарных дней, включая
+# сегодня ("неделя" - сегодня и 6 дней до него), None - "за все время".
+# Одна граница для текста (дневные итоги), Excel (заказы) и аналитики админа
+def stats_period_start(days: int = None):
+    if not days:
+        return None
+    return datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
 
-from datetime import datetime, timedelta
+# Строки заказов для Excel-выгрузки пачками через серверный курсор,
+# без ORM-объектов: память не зависит от числа заказов
+async def stream_orders_for_export(session: AsyncSession, user_id: int, days: int = None, chunk_size: int = 500):
 
-# Получить статистику за период (days=None значит "за все время")
-async def get_orders_for_stats(session: AsyncSession, telegram_id: int, days: int = None):
-    user_res = await session.execute(select(User).where(User.telegram_id == telegram_id))
-    user = user_res.scalar()
-    if not user: return []
+    query = (
+        select(
+            Order.created, Restaurant.name, Category.name, MenuItem.name, Order.fixed_price,
+            MenuItem.calories, MenuItem.proteins, MenuItem.fats, MenuItem.carbohydrates,
+        )
+        .outerjoin(MenuItem, Order.item_id == MenuItem.id)
+        .outerjoin(Category, MenuItem.category_id == Category.id)
+        .outerjoin(MenuGroup, Category.group_id == MenuGroup.id)
+        .outerjoin(Restaurant, MenuGroup.restaurant_id == Restaurant.id)
+        .where(Order.user_id == user_id)
+    )
+    if days:
+        query = query.where(Order.created >= stats_period_start(days))
+    query = query.order_by(Order.created.desc()).execution_options(yield_per=chunk_size)
+
+    result = await session.stream(query)
+    async for chunk in result.partitions():
+        yield chunk
 
-    query = select(Order).options(
-        joinedload(Order.item).joinedload(MenuItem.category).joinedload(Category.group).joinedload(MenuGroup.restaurant)
-    ).where(Order.user_id == user.id)
+# Итоги за период по дневным агрегатам: O(дней), а не O(заказов)
+_STATS_SUMMARY = select(*(func.coalesce(func.sum(getattr(OrderDailyStat, field)), 0) for field in ROLLUP_FIELDS)).where(
+    OrderDailyStat.user_id == bindparam("user_id")
+)
+_STATS_SUMMARY_SINCE = _STATS_SUMMARY.where(OrderDailyStat.day >= bindparam("start_day"))
 
-    # Фильтр по дате, если указано кол-во дней
+async def get_stats_summary(session: AsyncSession, user_id: int, days: int = None) -> dict:
+    # Гранулярность - сутки: период начинается с полуночи дня (сегодня - days)
     if days:
-        start_date = datetime.now() - timedelta(days=days)
-        query = query.where(Order.created >= start_date)
-    
-    query = query.order_by(Order.created.desc())
-    
-    result = await session.execute(query)
-    return result.scalars().all()
\ No newline at end of file
+        start_day = stats_period_start(days).date()
+        row = (await session.execute(_STATS_SUMMARY_SINCE, {"user_id": user_id, "start_day": start_day})).one()
+    else:
+        row = (await session.execute(_STATS_SUMMARY, {"user_id": user_id})).one()
+    return dict(zip(ROLLUP_FIELDS, row))
+
+# Пересчет дневных итогов по всем заказам (то же делают миграции 3 и 4 в database/migrations.py)
+async def backfill_order_rollups(session: AsyncSession) -> int:
+    await session.run_sync(backfill_order_daily_stats)
+    count = await session.scalar(select(func.count(OrderDailyStat.id)))
+    await session.run_sync(backfill_analytics)
+    await session.commit()
+    return count
@@ -0,0 +1,68 @@
+import random
+from collections import OrderedDict, deque
+
+from config import RANDOM_HISTORY_SIZE
+from database.cache import menu_cache
+
+# Случайное блюдо без ORDER BY random(): выбираем индекс в готовом массиве id
+# из снимка каталога. Массивы пересобираются вместе со снимком при импорте меню.
+
+class RandomSampler:
+    def __init__(self, cache=menu_cache, history_size: int = RANDOM_HISTORY_SIZE, max_users: int = 10_000):
+        self.cache = cache
+        self.history_size = history_size
+        self.max_users = max_users
+        # users.id -> последние предложенные id (LRU по пользователям)
+        self._recent = OrderedDict()
+
+    def recent(self, user_id: int):
+        return self._recent.get(user_id) if self.history_size else None
+
+    def remember(self, user_id: int, item_id: int):
+        if not self.history_size or user_id is None:
+            return
+        recent = self._recent.get(user_id)
+        if recent is None:
+            recent = deque(maxlen=self.history_size)
+            self._recent[user_id] = recent
+            if len(self._recent) > self.max_users:
+                self._recent.popitem(last=False)
+        else:
+            self._recent.move_to_end(user_id)
+        recent.append(item_id)
+
+    def _choose(self, ids, recent) -> int:
+        if not recent:
+            return random.choice(ids)
+        # Область почти вся из недавних - выбираем из оставшихся явно
+        if len(ids) <= 2 * len(recent):
+            fresh = [i for i in ids if i not in recent]
+            return random.choice(fresh or ids)
+        # Иначе отказ с вероятностью < 1/2 на попытку: в среднем до двух выборок
+        while True:
+            item_id = random.choice(ids)
+            if item_id not in recent:
+                return item_id
+
+    @staticmethod
+    def scope_ids(snap, restaurant_id: int = None, group_id: int = 0, category_id: int = 0):
+        # Область - самая узкая из заданных: категория > группа > ресторан > всё меню
+        if category_id:
+            return snap.ids_by_cat.get(category_id)
+        if group_id:
+            return snap.ids_by_group.get(group_id)
+        if restaurant_id:
+            return snap.ids_by_rest.get(restaurant_id)
+        return snap.all_ids
+
+    async def pick(self, user_id: int = None, restaurant_id: int = None, group_id: int = 0, category_id: int = 0):
+        snap = await self.cache.snapshot()
+        ids = self.scope_ids(snap, restaurant_id, group_id, category_id)
+        if not ids:
+            return None
+
+        item_id = self._choose(ids, self.recent(user_id))
+        self.remember(user_id, item_id)
+        return snap.items[item_id]
+
+random_sampler = RandomSampler()
@@ -0,0 +1,118 @@
+import asyncio
+import heapq
+import re
+from collections import Counter
+
+from database.cache import menu_cache
+
+# Поиск блюд для inline-режима (@bot борщ) без LIKE '%...%' по базе.
+# Индекс строится по снимку каталога: триграммы слов названия и состава
+# (нечеткое совпадение, опечатки) и префиксы слов названия (короткие запросы).
+# Новый снимок после импорта меню -> индекс пересобирается.
+
+_WORD = re.compile(r"[0-9a-zа-я]+")
+
+def normalize(text: str) -> list:
+    return _WORD.findall((text or "").lower().replace("ё", "е"))
+
+def _grams(word: str) -> set:
+    # "$борщ" -> $бо, бор, орщ: начало слова помечено, поэтому префикс
+    # запроса совпадает с началом слова сильнее, чем с серединой
+    padded = "$" + word
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+SHORT_QUERY = 2  # запросы до стольких символов ищутся по префиксам названий
+MIN_SCORE = 0.45
+
+class SearchIndex:
+    """Неизменяемый индекс одного снимка меню."""
+
+    def __init__(self, snap):
+        self.version = snap.version
+        self.items = tuple(snap.items.values())
+        self.rest_names = {r.id: r.name for r in snap.restaurants}
+        self.names = tuple(" ".join(normalize(i.name)) for i in self.items)
+
+        name_grams, comp_grams, prefixes = {}, {}, {}
+        for pos, item in enumerate(self.items):
+            name_words = normalize(item.name)
+            for gram in set().union(*map(_grams, name_words)):
+                name_grams.setdefault(gram, []).append(pos)
+            comp_words = normalize(item.composition)
+            for gram in set().union(*map(_grams, comp_words)):
+                comp_grams.setdefault(gram, []).append(pos)
+            for prefix in {w[:n] for w in name_words for n in range(1, SHORT_QUERY + 1)}:
+                prefixes.setdefault(prefix, []).append(pos)
+
+        self.name_grams = {k: tuple(v) for k, v in name_grams.items()}
+        self.comp_grams = {k: tuple(v) for k, v in comp_grams.items()}
+        self.prefixes = {k: tuple(v) for k, v in prefixes.items()}
+
+    def search(self, query: str, limit: int = 50) -> list:
+        words = normalize(query)
+        if not words:
+            return []
+        phrase = " ".join(words)
+
+        if len(phrase) <= SHORT_QUERY:
+            found = self.prefixes.get(phrase, ())
+            # Короче название - ближе к запросу ("Борщ" выше "Борщ с пампушками")
+            best = heapq.nsmallest(limit, found, key=lambda pos: (len(self.names[pos]), pos))
+            return [self.items[pos] for pos in best]
+
+        grams = set().union(*map(_grams, words))
+        # Counter.update по кортежам считается на C - это основная работа поиска
+        name_hits, comp_hits = Counter(), Counter()
+        for gram in grams:
+            postings = self.name_grams.get(gram)
+            if postings:
+                name_hits.update(postings)
+            postings = self.comp_grams.get(gram)
+            if postings:
+                comp_hits.update(postings)
+
+        total = len(grams)
+        scored = []
+        for pos in name_hits.keys() | comp_hits.keys():
+            # Совпадение в составе весит меньше, чем в названии
+            score = max(name_hits.get(pos, 0) / total, 0.6 * comp_hits.get(pos, 0) / total)
+            if score < MIN_SCORE:
+                continue
+            name = self.names[pos]
+            if name.startswith(phrase):
+                score += 0.3
+            elif phrase in name:
+                score += 0.15
+            scored.append((score, -len(name), -pos))
+
+        best = heapq.nlargest(limit, scored)
+        return [self.items[-neg_pos] for _, _, neg_pos in best]
+
+class MenuSearch:
+    def __init__(self, cache=menu_cache):
+        self.cache = cache
+        self._index = None
+        self._lock = asyncio.Lock()
+
+    async def index(self) -> SearchIndex:
+        snap = await self.cache.snapshot()
+        index = self._index
+        if index is not None and index.version == snap.version:
+            return index
+
+        async with self._lock:
+            # Пока ждали лок, индекс по этому снимку мог собрать кто-то другой
+            index = self._index
+            if index is None or index.version != snap.version:
+                # Сборка на 50k блюд занимает заметное время - не держим event loop
+                index = await asyncio.to_thread(SearchIndex, snap)
+                self._index = index
+            return index
+
+    async def search(self, query: str, limit: int = 50) -> list:
+        return (await self.index()).search(query, limit)
+
+    async def restaurant_name(self, restaurant_id: int) -> str:
+        return (await self.index()).rest_names.get(restaurant_id, "")
+
+menu_search = MenuSearch()
@@ -0,0 +1,119 @@
+import time
+from collections import OrderedDict
+
+from config import STATS_CACHE_TTL, STATS_CACHE_MAX_ENTRIES, STATS_CACHE_MAX_MB
+
+# Готовые отчеты статистики: текст сводки и байты xlsx по (пользователь, отчет).
+# "За неделю" -> "Скачать Excel" -> "Назад" -> "За неделю" второй раз не ходит
+# в базу и не собирает файл. Записи пользователя выкидываются, как только
+# add_orders/delete_order меняют его заказы; TTL страхует от всего
+# остального (переименование блюд в меню и т.п.).
+
+def _size(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    return 64  # None ("заказов нет") и мелкие значения
+
+class Uncached:
+    """Результат build(), который надо вернуть вызвавшему, но не класть в кэш."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+class StatsCache:
+    def __init__(self, ttl: float = STATS_CACHE_TTL, max_entries: int = STATS_CACHE_MAX_ENTRIES,
+                 max_bytes: int = int(STATS_CACHE_MAX_MB * 1024 * 1024)):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (user_id, *key) -> (истекает, значение, размер), LRU
+        self._by_user = {}  # user_id -> ключи его записей
+        self._bytes = 0
+        # Отчет, который считался во время изменения заказов, класть в кэш нельзя:
+        # номер события инвалидации, после которого пользователя трогали
+        self._epoch = 0
+        self._building = {}  # user_id -> сколько отчетов сейчас считается
+        self._touched = {}  # user_id -> epoch последней инвалидации во время расчета
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _drop(self, full_key):
+        _, _, size = self._entries.pop(full_key)
+        self._bytes -= size
+        keys = self._by_user.get(full_key[0])
+        if keys is not None:
+            keys.discard(full_key)
+            if not keys:
+                del self._by_user[full_key[0]]
+
+    def fits(self, size: int) -> bool:
+        # Огромная выгрузка "за всё время" вытеснила бы всех остальных
+        return size <= self.max_bytes // 8
+
+    def _store(self, full_key, value):
+        size = _size(value)
+        if not self.fits(size):
+            return
+        if full_key in self._entries:
+            self._drop(full_key)
+        self._entries[full_key] = (time.monotonic() + self.ttl, value, size)
+        self._by_user.setdefault(full_key[0], set()).add(full_key)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+
+    async def get(self, user_id: int, key: tuple, build):
+        """Значение из кэша или результат await build() (None тоже кэшируется,
+        Uncached(value) - нет)."""
+        full_key = (user_id, *key)
+        entry = self._entries.get(full_key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.hits += 1
+                self._entries.move_to_end(full_key)
+                return entry[1]
+            self._drop(full_key)
+
+        self.misses += 1
+        started = self._epoch
+        self._building[user_id] = self._building.get(user_id, 0) + 1
+        try:
+            value = await build()
+        finally:
+            stale = self._touched.get(user_id, -1) > started
+            left = self._building[user_id] - 1
+            if left:
+                self._building[user_id] = left
+            else:
+                del self._building[user_id]
+                self._touched.pop(user_id, None)
+        if isinstance(value, Uncached):
+            return value.value
+        if not stale:
+            self._store(full_key, value)
+        return value
+
+    def invalidate_user(self, user_id: int):
+        self.invalidations += 1
+        self._epoch += 1
+        if user_id in self._building:
+            self._touched[user_id] = self._epoch
+        for full_key in list(self._by_user.get(user_id, ())):
+            self._drop(full_key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+stats_cache = StatsCache()
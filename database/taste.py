@@ -0,0 +1,223 @@
+import bisect
+import random
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, bindparam
+
+from config import (
+    TASTE_ENABLED, TASTE_MIN_ORDERS, TASTE_CATEGORY_BOOST,
+    TASTE_RECENT_DAYS, TASTE_RECENT_PENALTY, TASTE_DAILY_KCAL,
+)
+from database.cache import menu_cache
+from database.engine import session_maker
+from database.models import MenuItem, Order
+from database.sampler import random_sampler
+
+# Персональный "🎲": вес блюда зависит от истории заказов пользователя.
+# Профиль (заказы по категориям + что ели последние дни) читается из базы
+# один раз, дальше его правят add_orders/delete_order после commit,
+# так что выбор историю заказов не перечитывает. Для области (ресторан/группа/
+# категория) считается массив накопленных весов; выбор - bisect по нему.
+# Массив пересчитывается только при новом заказе, новом меню или раз в час
+# (штраф за недавнее слабеет со временем).
+
+OVER_BUDGET = 0.05  # множитель для блюд, которые не влезают в остаток дневной нормы
+PICK_TRIES = 5  # попыток не повторить последние предложенные блюда
+MAX_SCOPES = 8  # массивов весов на пользователя
+
+_CATEGORY_COUNTS = (
+    select(MenuItem.category_id, func.count(Order.id))
+    .join(MenuItem, Order.item_id == MenuItem.id)
+    .where(Order.user_id == bindparam("user_id"))
+    .group_by(MenuItem.category_id)
+)
+_RECENT_ORDERS = (
+    select(Order.item_id, Order.created, MenuItem.calories)
+    .join(MenuItem, Order.item_id == MenuItem.id)
+    .where(Order.user_id == bindparam("user_id"), Order.created >= bindparam("horizon"))
+)
+
+class TasteProfile:
+    __slots__ = ("categories", "orders", "recent", "revision", "weights")
+
+    def __init__(self):
+        self.categories = {}  # category_id -> число заказов
+        self.orders = 0
+        self.recent = {}  # item_id -> [(время заказа, ккал), ...] за последние TASTE_RECENT_DAYS
+        self.revision = 0
+        self.weights = OrderedDict()  # область -> (ключ, ids, накопленные веса), LRU
+
+    def add(self, item_id: int, category_id: int, calories: float, created: datetime):
+        self.orders += 1
+        if category_id is not None:
+            self.categories[category_id] = self.categories.get(category_id, 0) + 1
+        self.recent.setdefault(item_id, []).append((created, calories or 0))
+        self.revision += 1
+
+    def remove(self, item_id: int, category_id: int, created: datetime):
+        self.orders = max(self.orders - 1, 0)
+        count = self.categories.get(category_id)
+        if count is not None:
+            if count > 1:
+                self.categories[category_id] = count - 1
+            else:
+                del self.categories[category_id]
+        times = self.recent.get(item_id)
+        if times:
+            # Пачка OrderWriter дает всем заказам одно время - убираем только один
+            for i, row in enumerate(times):
+                if row[0] == created:
+                    del times[i]
+                    break
+            if not times:
+                del self.recent[item_id]
+        self.revision += 1
+
+class TasteProfiles:
+    def __init__(self, cache=menu_cache, sampler=random_sampler, session_factory=session_maker,
+                 enabled: bool = TASTE_ENABLED, min_orders: int = TASTE_MIN_ORDERS,
+                 boost: float = TASTE_CATEGORY_BOOST, recent_days: int = TASTE_RECENT_DAYS,
+                 penalty: float = TASTE_RECENT_PENALTY, daily_kcal: float = TASTE_DAILY_KCAL,
+                 max_users: int = 10_000):
+        self.cache = cache
+        self.sampler = sampler
+        self._session_factory = session_factory
+        self.enabled = enabled
+        self.min_orders = min_orders
+        self.boost = boost
+        self.window = timedelta(days=recent_days)
+        self.penalty = penalty
+        self.daily_kcal = daily_kcal
+        self.max_users = max_users
+        self._profiles = OrderedDict()  # users.id -> TasteProfile, LRU
+        self._loading = {}  # users.id -> пришел ли заказ, пока профиль читался
+        self.loads = 0
+        self.builds = 0
+        self.picks = 0
+
+    # --- ПРОФИЛИ ---
+    async def _load(self, user_id: int) -> TasteProfile:
+        profile = TasteProfile()
+        horizon = datetime.now() - self.window
+        async with self._session_factory() as session:
+            rows = await session.execute(_CATEGORY_COUNTS, {"user_id": user_id})
+            for category_id, count in rows:
+                profile.categories[category_id] = count
+                profile.orders += count
+            rows = await session.execute(_RECENT_ORDERS, {"user_id": user_id, "horizon": horizon})
+            for item_id, created, calories in rows:
+                profile.recent.setdefault(item_id, []).append((created, calories or 0))
+        return profile
+
+    async def profile(self, user_id: int) -> TasteProfile:
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            self._profiles.move_to_end(user_id)
+            return profile
+
+        self.loads += 1
+        self._loading[user_id] = False
+        try:
+            profile = await self._load(user_id)
+        finally:
+            stale = self._loading.pop(user_id, True)
+        # Заказ успел записаться между чтением и сюда: профиль мог его не увидеть.
+        # Отдаем как есть, но не запоминаем - в следующий раз прочитаем заново.
+        if not stale:
+            self._profiles[user_id] = profile
+            if len(self._profiles) > self.max_users:
+                self._profiles.popitem(last=False)
+        return profile
+
+    def order_added(self, user_id: int, item_id: int, category_id: int, calories: float, created: datetime):
+        if user_id in self._loading:
+            self._loading[user_id] = True
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            profile.add(item_id, category_id, calories, created)
+
+    def order_deleted(self, user_id: int, item_id: int, category_id: int, created: datetime):
+        if user_id in self._loading:
+            self._loading[user_id] = True
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            profile.remove(item_id, category_id, created)
+
+    # --- ВЕСА ---
+    def _build(self, profile: TasteProfile, snap, ids, now: datetime) -> list:
+        self.builds += 1
+        horizon = now - self.window
+        last, eaten = {}, 0.0
+        for item_id in list(profile.recent):
+            rows = [row for row in profile.recent[item_id] if row[0] >= horizon]
+            if not rows:
+                # Вышло из окна - выкидываем, чтобы профиль не рос
+                del profile.recent[item_id]
+                continue
+            profile.recent[item_id] = rows
+            last[item_id] = max(created for created, _ in rows)
+            eaten += sum(kcal for created, kcal in rows if created.date() == now.date())
+
+        top = max(profile.categories.values(), default=0) or 1
+        left = self.daily_kcal - eaten if self.daily_kcal else None
+        window = self.window.total_seconds()
+        cumulative, total = [], 0.0
+        for item_id in ids:
+            item = snap.items[item_id]
+            weight = 1 + self.boost * profile.categories.get(item.category_id, 0) / top
+            seen = last.get(item_id)
+            if seen is not None:
+                # Вчерашнее почти не предлагаем, к концу окна штраф сходит на нет
+                age = min((now - seen).total_seconds() / window, 1)
+                weight *= self.penalty + (1 - self.penalty) * age
+            if left is not None and (item.calories or 0) > left:
+                weight *= OVER_BUDGET
+            total += weight
+            cumulative.append(total)
+        return cumulative
+
+    def _weights(self, profile: TasteProfile, snap, scope: tuple, ids, now: datetime) -> list:
+        key = (snap.version, profile.revision, now.date(), now.hour)
+        cached = profile.weights.get(scope)
+        if cached is not None and cached[0] == key:
+            profile.weights.move_to_end(scope)
+            return cached[2]
+        cumulative = self._build(profile, snap, ids, now)
+        profile.weights[scope] = (key, ids, cumulative)
+        profile.weights.move_to_end(scope)
+        if len(profile.weights) > MAX_SCOPES:
+            profile.weights.popitem(last=False)
+        return cumulative
+
+    # --- ВЫБОР ---
+    async def pick(self, user_id: int = None, restaurant_id: int = None, group_id: int = 0, category_id: int = 0):
+        if not self.enabled or user_id is None:
+            return await self.sampler.pick(user_id, restaurant_id, group_id, category_id)
+        profile = await self.profile(user_id)
+        if profile.orders < self.min_orders:
+            return await self.sampler.pick(user_id, restaurant_id, group_id, category_id)
+
+        snap = await self.cache.snapshot()
+        ids = self.sampler.scope_ids(snap, restaurant_id, group_id, category_id)
+        if not ids:
+            return None
+        cumulative = self._weights(profile, snap, (restaurant_id or 0, group_id, category_id), ids, datetime.now())
+        total = cumulative[-1]
+        if total <= 0:
+            return await self.sampler.pick(user_id, restaurant_id, group_id, category_id)
+
+        self.picks += 1
+        recent = self.sampler.recent(user_id)
+        for _ in range(PICK_TRIES):
+            pos = min(bisect.bisect(cumulative, random.random() * total), len(ids) - 1)
+            item_id = ids[pos]
+            if not recent or item_id not in recent:
+                break
+        self.sampler.remember(user_id, item_id)
+        return snap.items[item_id]
+
+    def stats(self) -> dict:
+        return {"users": len(self._profiles), "loads": self.loads, "builds": self.builds, "picks": self.picks}
+
+taste_profiles = TasteProfiles()
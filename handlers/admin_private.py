@@ -1,16 +1,34 @@
-import os
-import pandas as pd
+import html
+from contextlib import aclosing
+from datetime import date
+
 from aiogram import Router, F, types, Bot
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from config import ADMIN_PASSWORD
+from config import ADMIN_PASSWORD, ANALYTICS_TOP
+from keyboards.inline import AnalyticsCall, get_analytics_kb
 from keyboards.reply import admin_main_kb, cancel_kb
-from database.engine import session_maker
-from database.orm import add_restaurant, add_menu_items
+from database.analytics import (
+    REPORTS, SORTS, PERIOD_NAMES, PERIOD_BUTTONS, get_report, refresh, sort_rows, analytics_cache, ANALYTICS_SCOPE,
+)
+from database.orm import add_restaurant, sync_menu_items
+from database.search import menu_search
+from middlewares.db import LazySession
+from utils.executor import cpu_executor, ExecutorBusy
+from utils.excel import build_report_workbook
+from utils.menu_import import iter_menu_sheets
+
+admin_router = Router(name="admin_router")
+
+# telegram_id тех, кто ввел пароль (в памяти процесса; после перезапуска - войти заново).
+# Апдейты одного пользователя всегда приходят в один воркер, так что набор у каждого свой
+admin_ids = set()
 
-admin_router = Router()
+def is_admin(event) -> bool:
+    return event.from_user is not None and event.from_user.id in admin_ids
 
 class AdminStates(StatesGroup):
     waiting_for_password = State()
@@ -37,6 +55,7 @@ async def start_admin_login(message: types.Message, state: FSMContext):
 @admin_router.message(AdminStates.waiting_for_password)
 async def check_password(message: types.Message, state: FSMContext):
     if message.text == ADMIN_PASSWORD:
+        admin_ids.add(message.from_user.id)
         await message.answer("✅ Добро пожаловать, Шеф!", reply_markup=admin_main_kb)
         await state.clear()
     else:
@@ -58,57 +77,150 @@ async def process_name(message: types.Message, state: FSMContext):
 async def process_description(message: types.Message, state: FSMContext):
     await state.update_data(description=message.text)
     await message.answer(
-        "📂 Отправьте Excel-файл.\n"
-        "Столбцы (строго так): Группа, Категория, Название блюда, Состав, Вес, Калории, Белки, Жиры, Углеводы, Цена"
+        "📂 Отправьте Excel-файл (или CSV).\n"
+        "Столбцы (строго так): Группа, Категория, Название блюда, Состав, Вес, Калории, Белки, Жиры, Углеводы, Цена\n"
+        "Если в книге несколько листов, каждый лист - отдельный ресторан с названием листа."
     )
     await state.set_state(AdminStates.waiting_for_file)
 
-# --- ОБРАБОТКА ФАЙЛА (ИСПРАВЛЕННАЯ 2.0) ---
+# --- ОБРАБОТКА ФАЙЛА ---
+ERRORS_IN_MESSAGE = 10  # ошибок в тексте ответа; полный список - файлом
+
+def _sheet_report(result: dict, name: str, summary: dict = None) -> str:
+    title = f"<b>{html.escape(name)}</b>: строк {result['rows']}"
+    if result["errors"]:
+        return f"❌ {title}, ошибок {len(result['errors'])} - лист не загружен"
+    if summary is None:
+        return f"⚪️ {title} - пустой лист, пропущен"
+    return (
+        f"✅ {title} | ➕ {summary['items_added']} ✏️ {summary['items_updated']} "
+        f"🙈 {summary['items_hidden']} ✔️ {summary['items_unchanged']} "
+        f"⏱ {sum(summary['timings'].values()) * 1000:.0f} мс"
+    )
+
 @admin_router.message(AdminStates.waiting_for_file, F.document)
-async def process_menu_file(message: types.Message, state: FSMContext, bot: Bot):
+async def process_menu_file(message: types.Message, state: FSMContext, bot: Bot, db: LazySession):
     data = await state.get_data()
     rest_name = data['name']
     rest_desc = data['description']
+    filename = message.document.file_name or "menu.xlsx"
 
-    file_id = message.document.file_id
-    file = await bot.get_file(file_id)
-    file_path = f"temp_{file.file_unique_id}.xlsx"
-    await bot.download_file(file.file_path, file_path)
+    # Файл скачивается в память: на диск ничего не пишем
+    content = (await bot.download(message.document)).getvalue()
 
+    reports, errors = {}, []
+    loaded = 0
     try:
-        # Читаем Excel
-        df = pd.read_excel(file_path)
-        
-        # Очистка данных:
-        
-        # 1. Текстовые поля: убираем nan
-        text_cols = ['Группа', 'Категория', 'Название блюда', 'Состав', 'Вес']
-        for col in text_cols:
-            if col in df.columns:
-                df[col] = df[col].astype(str).replace('nan', '')
-
-        # 2. Числовые поля: меняем запятую на точку и конвертируем
-        num_cols = ['Калории', 'Белки', 'Жиры', 'Углеводы', 'Цена']
-        for col in num_cols:
-            if col in df.columns:
-                # Сначала превращаем в строку, меняем запятую на точку
-                df[col] = df[col].astype(str).str.replace(',', '.')
-                # Теперь превращаем в число
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-        menu_data = df.to_dict(orient='records')
-
-        async with session_maker() as session:
-            restaurant = await add_restaurant(session, rest_name, rest_desc)
-            await add_menu_items(session, restaurant.id, menu_data)
-        
-        await message.answer(f"✅ Ресторан '{rest_name}' загружен!\nБлюд: {len(menu_data)}", reply_markup=admin_main_kb)
-        await state.clear()
-
+        # Листы разбираются в пуле параллельно; строки с ошибками не загружаются
+        async with aclosing(iter_menu_sheets(content, filename)) as sheets:
+            async for result in sheets:
+                # Один лист (или CSV) - ресторан из диалога, несколько - по названиям листов
+                name = rest_name if result["sheets"] == 1 else result["sheet"].strip() or rest_name
+                summary = None
+                if result["items"] and not result["errors"]:
+                    # Каждый лист - своя транзакция (add_restaurant и sync_menu_items делают commit)
+                    session = db.get()
+                    restaurant = await add_restaurant(session, name, rest_desc)
+                    # Обновляем меню через дифф: id блюд сохраняются, заказы не теряются
+                    summary = await sync_menu_items(session, restaurant.id, result["items"])
+                    loaded += 1
+                reports[result["index"]] = _sheet_report(result, name, summary)
+                errors += [f"{name}, строка {line}: {text}" for line, text in result["errors"]]
+    except ExecutorBusy:
+        await message.answer("⏳ Сервер сейчас занят обработкой файлов. Отправьте файл еще раз через минуту.")
+        return
     except Exception as e:
+        # Транзакция листа, на котором упали, откатывается; прошлые листы уже зафиксированы
+        await db.close(commit=False)
         error_msg = str(e)[:1000]
         await message.answer(f"❌ Ошибка при чтении файла:\n\n{error_msg}...")
-    
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
\ No newline at end of file
+        return
+
+    if loaded:
+        # Поисковый индекс собираем сразу, а не на первом inline-запросе пользователя
+        await menu_search.index()
+
+    text = [f"📥 Загружено ресторанов: {loaded} из {len(reports)}", ""]
+    text += [reports[index] for index in sorted(reports)]
+    if errors:
+        text += ["", "Ошибки:"] + [html.escape(line) for line in errors[:ERRORS_IN_MESSAGE]]
+        if len(errors) > ERRORS_IN_MESSAGE:
+            text.append(f"... и еще {len(errors) - ERRORS_IN_MESSAGE}, полный список в файле")
+        text += ["", "Исправьте ошибки и отправьте файл еще раз - загруженные листы при повторе не изменятся."]
+    await message.answer("\n".join(text)[:4000], reply_markup=admin_main_kb)
+    if len(errors) > ERRORS_IN_MESSAGE:
+        report = types.BufferedInputFile("\n".join(errors).encode(), filename="menu_errors.txt")
+        await message.answer_document(report)
+    if not errors:
+        await state.clear()
+
+# --- АНАЛИТИКА ---
+def render_report(report: str, period: str, sort: str, data: dict) -> str:
+    rows = data["rows"]
+    total_orders = sum(r[1] for r in rows)
+    total_revenue = sum(r[2] for r in rows)
+    lines = [f"📈 <b>{REPORTS[report]} за {PERIOD_NAMES[period]}</b>"]
+    if not total_orders:
+        lines.append("\nЗаказов за этот период нет.")
+    elif report == "hours":
+        # Загрузка по часам: полоска относительно самого занятого часа
+        peak = max(r[1] for r in rows)
+        lines.append("")
+        for name, orders, revenue in rows:
+            if orders:
+                lines.append(f"<code>{name} {'█' * max(1, round(12 * orders / peak)):<12}</code> {orders}")
+    else:
+        lines.append(f"Сортировка: {SORTS[sort]}\n")
+        for num, (name, orders, revenue) in enumerate(sort_rows(rows, sort)[:ANALYTICS_TOP], start=1):
+            lines.append(f"{num}. {html.escape(name)}: {orders} зак. | {revenue:.0f}₽ | чек {revenue / orders:.0f}₽")
+    if total_orders:
+        lines.append(f"\n🧾 Всего: {total_orders} заказов, {total_revenue:.0f}₽, средний чек {total_revenue / total_orders:.0f}₽")
+    lines.append(f"🕒 Посчитано в {data['at']:%H:%M:%S}")
+    return "\n".join(lines)
+
+async def show_report(message: types.Message, db: LazySession, report="items", period="week", sort="orders", edit=False):
+    data = await get_report(db.get, report, period)
+    text = render_report(report, period, sort, data)
+    markup = get_analytics_kb(report, period, sort, REPORTS, PERIOD_BUTTONS, SORTS)
+    if edit:
+        try:
+            await message.edit_text(text, reply_markup=markup)
+        except TelegramBadRequest:
+            # Тот же отчет и та же сортировка - менять нечего
+            pass
+    else:
+        await message.answer(text, reply_markup=markup)
+
+@admin_router.message(F.text == "📈 Аналитика", is_admin)
+async def analytics_start(message: types.Message, db: LazySession):
+    await show_report(message, db)
+
+@admin_router.callback_query(AnalyticsCall.filter(F.action.in_({"show", "refresh"})), is_admin)
+async def analytics_handler(callback: types.CallbackQuery, callback_data: AnalyticsCall, db: LazySession):
+    if callback_data.action == "refresh":
+        refresh()
+    await show_report(callback.message, db, callback_data.report, callback_data.period, callback_data.sort, edit=True)
+    await callback.answer()
+
+@admin_router.callback_query(AnalyticsCall.filter(F.action == "xlsx"), is_admin)
+async def analytics_xlsx(callback: types.CallbackQuery, callback_data: AnalyticsCall, db: LazySession):
+    await callback.answer("Собираю файл... ⏳")
+    period = callback_data.period
+
+    async def build():
+        # Все отчеты периода - по листу на отчет; строки берутся из того же кэша
+        sheets = []
+        for report, title in REPORTS.items():
+            rows = (await get_report(db.get, report, period))["rows"]
+            sheets.append((title.split(" ", 1)[-1], rows if report == "hours" else sort_rows(rows, "orders")))
+        return await cpu_executor.run(build_report_workbook, sheets)
+
+    try:
+        data = await analytics_cache.get(ANALYTICS_SCOPE, ("xlsx", period, date.today()), build)
+    except ExecutorBusy:
+        await callback.message.answer("⏳ Сервер сейчас занят обработкой файлов. Попробуйте через минуту.")
+        return
+    await callback.message.answer_document(
+        types.BufferedInputFile(data, filename=f"analytics_{period}_{date.today():%Y%m%d}.xlsx"),
+        caption=f"📂 Аналитика за {PERIOD_NAMES[period]}",
+    )
@@ -1,68 +1,103 @@
-import pandas as pd
-from io import BytesIO
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import date
 from aiogram import Router, F, types
 from aiogram.filters import CommandStart
 from aiogram.exceptions import TelegramBadRequest
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import COMBO_BUDGETS
 from database.engine import session_maker
+from database.cache import menu_cache
+from database.taste import taste_profiles
+from database.stats_cache import stats_cache, Uncached
+from database.search import menu_search
+from database.combo import combo_composer
 from database.orm import (
-    get_restaurants, get_groups, get_categories, get_items_by_category, 
-    get_item, add_user, get_random_item, add_order, get_today_orders, delete_order,
-    get_orders_for_stats
+    get_today_orders, delete_order,
+    get_stats_summary, stream_orders_for_export
 )
 from keyboards.inline import (
     MenuCall, get_rests_kb, get_groups_kb, get_cats_kb, 
-    get_items_kb, get_item_actions_kb, OrderCall, get_delete_order_kb,
-    StatsCall, get_stats_kb, get_excel_kb
+    get_items_kb, get_item_actions_kb, OrderCall, get_orders_kb, ORDERS_PAGE_SIZE,
+    StatsCall, get_stats_kb, get_excel_kb, get_search_result_kb,
+    ComboCall, get_combo_rests_kb, get_combo_budget_kb, get_combo_kb
 )
 from keyboards.reply import user_main_kb
+from keyboards.render_cache import render_cache
+from middlewares.db import LazySession
+from utils.excel import StatsWorkbookWriter
+from utils.executor import cpu_executor, ExecutorBusy
+from utils.export_queue import export_queue
+from utils.order_writer import order_writer
+from utils.metrics import handler_errors
 
-user_router = Router()
+logger = logging.getLogger(__name__)
+
+user_router = Router(name="user_router")
 
 # --- 1. ГЛАВНОЕ МЕНЮ ---
 @user_router.message(CommandStart())
 async def start_cmd(message: types.Message):
-    async with session_maker() as session:
-        await add_user(session, message.from_user.id, message.from_user.username)
+    # Пользователя уже создал UserMiddleware
     await message.answer("Привет! Я помогу выбрать еду и прослежу за статистикой. 👇", reply_markup=user_main_kb)
 
 # --- 2. КНОПКА РЕСТОРАНЫ ---
 @user_router.message(F.text == "🍽 Рестораны")
 async def show_restaurants(message: types.Message):
-    async with session_maker() as session:
-        rests = await get_restaurants(session)
-    await message.answer("🍽 Выберите ресторан:", reply_markup=get_rests_kb(rests))
+    screen = await nav_screen(MenuCall(level=0), menu_cache.version)
+    sent = await message.answer(screen.text, reply_markup=screen.markup)
+    render_cache.remember(sent, screen)
 
 # --- 3. КНОПКА МОИ ЗАКАЗЫ ---
+def render_orders(orders, page: int):
+    # Один экран на все заказы дня: список текущей страницы + общий итог
+    pages = (len(orders) + ORDERS_PAGE_SIZE - 1) // ORDERS_PAGE_SIZE
+    page = max(0, min(page, pages - 1))
+    start = page * ORDERS_PAGE_SIZE
+    page_orders = orders[start:start + ORDERS_PAGE_SIZE]
+
+    total_price = sum(o.fixed_price for o in orders)
+    total_cals = sum(o.item.calories or 0 for o in orders)
+
+    lines = ["📋 Ваши заказы за сегодня:\n"]
+    for num, order in enumerate(page_orders, start=start + 1):
+        lines.append(f"{num}. 🍔 <b>{order.item.name}</b>\n    💰 {order.fixed_price}₽ | {order.item.calories} ккал")
+    lines.append(f"\n🏁 <b>ИТОГО: {total_price}₽ | {total_cals} ккал</b>")
+    lines.append("\nНажмите на заказ ниже, чтобы удалить его.")
+    return "\n".join(lines), get_orders_kb(page_orders, page, pages, start_num=start + 1)
+
 @user_router.message(F.text == "🛒 Мои заказы сегодня")
-async def show_my_orders(message: types.Message):
-    async with session_maker() as session:
-        orders = await get_today_orders(session, message.from_user.id)
+async def show_my_orders(message: types.Message, user_id: int, db: LazySession):
+    orders = await get_today_orders(db.get(), user_id)
     
     if not orders:
         await message.answer("Сегодня вы еще ничего не заказывали 🤷‍♂️")
         return
 
-    total_price = 0
-    total_cals = 0
-    await message.answer("📋 Ваши заказы за сегодня:")
-    for order in orders:
-        item = order.item
-        price = order.fixed_price
-        total_price += price
-        total_cals += (item.calories or 0)
-        info = f"🍔 <b>{item.name}</b>\n💰 {price}₽ | {item.calories} ккал"
-        await message.answer(info, reply_markup=get_delete_order_kb(order.id))
-
-    await message.answer(f"🏁 <b>ИТОГО: {total_price}₽ | {total_cals} ккал</b>")
-
-@user_router.callback_query(OrderCall.filter(F.action == "delete"))
-async def delete_order_handler(callback: types.CallbackQuery, callback_data: OrderCall):
-    async with session_maker() as session:
-        await delete_order(session, callback_data.order_id)
-    await callback.answer("Заказ удален")
-    await callback.message.delete()
+    text, markup = render_orders(orders, 0)
+    await message.answer(text, reply_markup=markup)
+
+@user_router.callback_query(OrderCall.filter())
+async def orders_page_handler(callback: types.CallbackQuery, callback_data: OrderCall, user_id: int, db: LazySession):
+    session = db.get()
+    if callback_data.action == "delete":
+        await delete_order(session, callback_data.order_id, user_id)
+    orders = await get_today_orders(session, user_id)
+
+    # Перерисовываем то же сообщение вместо отправки новых
+    if not orders:
+        await callback.message.edit_text("Сегодня вы еще ничего не заказывали 🤷‍♂️")
+    else:
+        text, markup = render_orders(orders, callback_data.page)
+        try:
+            await callback.message.edit_text(text, reply_markup=markup)
+        except TelegramBadRequest:
+            # Нажали на номер текущей страницы - менять нечего
+            pass
+    await callback.answer("Заказ удален" if callback_data.action == "delete" else None)
 
 # --- 4. СТАТИСТИКА ---
 @user_router.message(F.text == "📊 Статистика")
@@ -70,7 +105,7 @@ async def show_stats_menu(message: types.Message):
     await message.answer("Выберите период отчета:", reply_markup=get_stats_kb())
 
 @user_router.callback_query(StatsCall.filter(F.action == "view"))
-async def show_stats_text(callback: types.CallbackQuery, callback_data: StatsCall):
+async def show_stats_text(callback: types.CallbackQuery, callback_data: StatsCall, user_id: int, db: LazySession):
     if callback_data.period == "back":
         await callback.message.edit_text("Выберите период отчета:", reply_markup=get_stats_kb())
         return
@@ -79,144 +114,284 @@ async def show_stats_text(callback: types.CallbackQuery, callback_data: StatsCal
     days = days_map[callback_data.period]
     period_name = {"week": "неделю", "month": "месяц", "all": "всё время"}[callback_data.period]
 
-    async with session_maker() as session:
-        orders = await get_orders_for_stats(session, callback.from_user.id, days)
-
-    if not orders:
+    # "За неделю" считается от сегодняшнего дня - дата входит в ключ кэша
+    text = await stats_cache.get(
+        user_id, ("text", callback_data.period, date.today()),
+        lambda: build_stats_text(db, user_id, days, period_name),
+    )
+    if text is None:
         await callback.answer("За этот период заказов нет!", show_alert=True)
         return
+    await callback.message.edit_text(text, reply_markup=get_excel_kb(callback_data.period))
 
-    total_price = sum(o.fixed_price for o in orders)
-    total_cals = sum(o.item.calories or 0 for o in orders)
+async def build_stats_text(db: LazySession, user_id: int, days: int, period_name: str):
+    # Сумма по дневным итогам вместо загрузки всех заказов; сессия открывается только при промахе кэша
+    summary = await get_stats_summary(db.get(), user_id, days)
+
+    if not summary["orders_count"]:
+        return None
+
+    total_price = summary["spend"]
+    total_cals = summary["calories"]
     
-    text = (
+    return (
         f"📊 <b>Отчет за {period_name}:</b>\n\n"
-        f"🛒 Всего заказов: {len(orders)}\n"
+        f"🛒 Всего заказов: {summary['orders_count']}\n"
         f"💰 Потрачено: <b>{total_price}₽</b>\n"
         f"⚡️ Калории: {total_cals} ккал\n"
-        f"📅 Средний чек: {int(total_price / len(orders))}₽\n"
+        f"📅 Средний чек: {int(total_price / summary['orders_count'])}₽\n"
     )
-    await callback.message.edit_text(text, reply_markup=get_excel_kb(callback_data.period))
 
 @user_router.callback_query(StatsCall.filter(F.action == "excel"))
-async def send_stats_excel(callback: types.CallbackQuery, callback_data: StatsCall):
+async def send_stats_excel(callback: types.CallbackQuery, callback_data: StatsCall, user_id: int):
     await callback.answer("Генерирую файл... ⏳")
     days_map = {"week": 7, "month": 30, "all": None}
     days = days_map[callback_data.period]
 
-    async with session_maker() as session:
-        orders = await get_orders_for_stats(session, callback.from_user.id, days)
+    filename = f"stats_{callback_data.period}.xlsx"
 
-    if not orders:
-        await callback.answer("Нет данных")
+    async def send(document):
+        await callback.message.answer_document(document=document, caption=f"📂 Ваш отчет за {callback_data.period}")
+
+    # В файле названия блюд и ресторанов - версия меню тоже часть ключа
+    try:
+        data = await stats_cache.get(
+            user_id, ("xlsx", callback_data.period, date.today(), menu_cache.version),
+            lambda: build_stats_excel(user_id, days, filename, send),
+        )
+    except ExecutorBusy:
+        await callback.message.answer("⏳ Сервер сейчас занят обработкой файлов. Попробуйте через минуту.")
         return
+    if data is None:
+        await callback.message.answer("За этот период заказов нет 🤷‍♂️")
+    elif isinstance(data, bytes):
+        await send(types.BufferedInputFile(data, filename=filename))
 
-    data = []
-    for o in orders:
-        data.append({
-            "Дата": o.created.strftime("%Y-%m-%d %H:%M"),
-            "Ресторан": o.item.category.group.restaurant.name,
-            "Категория": o.item.category.name,
-            "Блюдо": o.item.name,
-            "Цена": o.fixed_price,
-            "Калории": o.item.calories,
-            "Белки": o.item.proteins,
-            "Жиры": o.item.fats,
-            "Углеводы": o.item.carbohydrates
-        })
-
-    df = pd.DataFrame(data)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Статистика')
-    output.seek(0)
+async def build_stats_excel(user_id: int, days: int, filename: str, send):
+    # Одинаковые запросы (пользователь, период) склеиваются в одну выгрузку
+    async with export_queue.job((user_id, days), lambda: export_stats_file(user_id, days)) as path:
+        if not path:
+            return None
+        if stats_cache.fits(os.path.getsize(path)):
+            return await cpu_executor.run_in_thread(_read_bytes, path)
+        # В кэш файл все равно не попадет - отправляем прямо с диска, не читая в память
+        await send(types.FSInputFile(path, filename=filename))
+        return Uncached(True)
 
-    filename = f"stats_{callback_data.period}.xlsx"
-    input_file = types.BufferedInputFile(output.read(), filename=filename)
-    await callback.message.answer_document(document=input_file, caption=f"📂 Ваш отчет за {callback_data.period}")
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def export_stats_file(user_id: int, days: int):
+    # Строки читаются из базы пачками и сразу пишутся в файл в пуле cpu_executor.
+    # Место в очереди пула проверяем один раз до начала: начатую выгрузку не обрываем.
+    # Выгрузка - общая задача export_queue и может пережить апдейт, который ее
+    # начал, поэтому сессия у нее своя, а не из DbSessionMiddleware
+    cpu_executor.admit()
+    writer = StatsWorkbookWriter()
+    async with session_maker() as session:
+        async for chunk in stream_orders_for_export(session, user_id, days):
+            await cpu_executor.run_in_thread(writer.append_rows, chunk)
+    if not writer.rows:
+        return None
+
+    fd, path = tempfile.mkstemp(prefix="stats_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        await cpu_executor.run_in_thread(writer.save, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
 
 # --- 5. ГЛАВНЫЙ ЦИКЛ НАВИГАЦИИ ---
+# Экраны навигации собираются один раз на версию меню (keyboards/render_cache.py)
+async def render_rests():
+    rests = await menu_cache.get_restaurants()
+    return "🍽 Выберите ресторан:", get_rests_kb(rests)
+
+async def render_groups(rest_id):
+    groups = await menu_cache.get_groups(rest_id)
+    return "📂 Выберите раздел:", get_groups_kb(groups, rest_id)
+
+async def render_cats(rest_id, group_id):
+    cats = await menu_cache.get_categories(group_id)
+    return "⬇ Выберите категорию:", get_cats_kb(cats, rest_id, group_id)
+
+async def render_items(rest_id, group_id, category_id):
+    items = await menu_cache.get_items_by_category(category_id)
+    return "⬇ Выберите блюдо:", get_items_kb(items, rest_id, group_id, category_id)
+
+# level -> (обработчик, какие поля MenuCall входят в ключ узла)
+NAV_SCREENS = {
+    0: (render_rests, ()),
+    1: (render_groups, ("rest_id",)),
+    2: (render_cats, ("rest_id", "group_id")),
+    3: (render_items, ("rest_id", "group_id", "category_id")),
+}
+
+async def nav_screen(callback_data: MenuCall, version: int):
+    render, fields = NAV_SCREENS[callback_data.level]
+    args = tuple(getattr(callback_data, f) for f in fields)
+    return await render_cache.screen((callback_data.level, *args), version, lambda: render(*args))
+
+def item_card_text(item, is_random: bool = False) -> str:
+    return (
+        f"{'🎲 Случайный выбор!' if is_random else ''}\n"
+        f"🍔 <b>{item.name}</b>\n\n"
+        f"⚖️ Вес: {item.weight}\n"
+        f"📃 Состав: {item.composition}\n"
+        f"⚡ Ккал: {item.calories}\n"
+        f"🥩 Б/Ж/У: {item.proteins} / {item.fats} / {item.carbohydrates}\n\n"
+        f"💰 <b>Цена: {item.price}₽</b>"
+    )
+
+async def render_item(item, callback_data: MenuCall, is_random: bool):
+    # Определяем контекст навигации (для кнопки "Назад" и "Заказать")
+    if is_random:
+        # Если рандом, то "Назад" должно вести в реальную категорию блюда
+        nav_group_id = item.group_id
+        nav_category_id = item.category_id
+    else:
+        # Если обычный просмотр, используем текущий путь
+        nav_group_id = callback_data.group_id
+        nav_category_id = callback_data.category_id
+
+    text = item_card_text(item, is_random)
+    markup = get_item_actions_kb(
+        callback_data.rest_id,
+        callback_data.group_id,
+        callback_data.category_id,
+        item.id,
+        is_random=is_random,
+        nav_group_id=nav_group_id,
+        nav_category_id=nav_category_id
+    )
+    return text, markup
+
 @user_router.callback_query(MenuCall.filter())
-async def menu_navigation(callback: types.CallbackQuery, callback_data: MenuCall):
-    session = session_maker()
+async def menu_navigation(callback: types.CallbackQuery, callback_data: MenuCall, user_id: int):
+    version = menu_cache.version
     try:
-        async with session:
-            # 1. ЗАКАЗ
-            if callback_data.level == 5 and callback_data.action == "order":
-                await add_order(session, callback.from_user.id, callback_data.item_id, quantity=1)
+        # 1. ЗАКАЗ
+        if callback_data.level == 5 and callback_data.action == "order":
+            # Ответ только после того, как пачка с заказом записана в базу
+            if await order_writer.submit(user_id, callback_data.item_id, quantity=1):
                 await callback.answer(f"✅ Заказ записан!", show_alert=True)
-                return
+            else:
+                await callback.answer("Блюдо больше не в меню 🤷‍♂️", show_alert=True)
+            return
 
-            # 2. РАНДОМ / БЛЮДО
-            elif callback_data.level == 4:
-                item = None
-                is_random = False
-                if callback_data.action == "random":
-                    item = await get_random_item(session, callback_data.rest_id, callback_data.group_id, callback_data.category_id)
-                    if not item:
-                        await callback.answer("Здесь пока пусто 🤷‍♂️", show_alert=True)
-                        return
-                    is_random = True
-                else:
-                    item = await get_item(session, callback_data.item_id)
-                
-                # Определяем контекст навигации (для кнопки "Назад" и "Заказать")
-                if is_random:
-                    # Если рандом, то "Назад" должно вести в реальную категорию блюда
-                    nav_group_id = item.category.group_id
-                    nav_category_id = item.category_id
-                else:
-                    # Если обычный просмотр, используем текущий путь
-                    nav_group_id = callback_data.group_id
-                    nav_category_id = callback_data.category_id
-                
-                text = (
-                    f"{'🎲 Случайный выбор!' if is_random else ''}\n"
-                    f"🍔 <b>{item.name}</b>\n\n"
-                    f"⚖️ Вес: {item.weight}\n"
-                    f"📃 Состав: {item.composition}\n"
-                    f"⚡ Ккал: {item.calories}\n"
-                    f"🥩 Б/Ж/У: {item.proteins} / {item.fats} / {item.carbohydrates}\n\n"
-                    f"💰 <b>Цена: {item.price}₽</b>"
+        # 2. РАНДОМ / БЛЮДО
+        elif callback_data.level == 4:
+            item = None
+            is_random = False
+            if callback_data.action == "random":
+                item = await taste_profiles.pick(
+                    user_id, callback_data.rest_id, callback_data.group_id, callback_data.category_id
                 )
-                try:
-                    await callback.message.edit_text(
-                        text, 
-                        reply_markup=get_item_actions_kb(
-                            callback_data.rest_id, 
-                            callback_data.group_id, 
-                            callback_data.category_id, 
-                            item.id, 
-                            is_random=is_random,
-                            nav_group_id=nav_group_id,
-                            nav_category_id=nav_category_id
-                        )
-                    )
-                except TelegramBadRequest:
-                    await callback.answer("🎲 То же самое!")
+                if not item:
+                    await callback.answer("Здесь пока пусто 🤷‍♂️", show_alert=True)
+                    return
+                is_random = True
+            else:
+                item = await menu_cache.get_item(callback_data.item_id)
+                if not item:
+                    await callback.answer("Блюдо больше не в меню 🤷‍♂️", show_alert=True)
                     return
 
-            # 3. НАВИГАЦИЯ
-            elif callback_data.level == 0:
-                rests = await get_restaurants(session)
-                await callback.message.edit_text("🍽 Выберите ресторан:", reply_markup=get_rests_kb(rests))
-
-            elif callback_data.level == 1:
-                groups = await get_groups(session, callback_data.rest_id)
-                await callback.message.edit_text("📂 Выберите раздел:", reply_markup=get_groups_kb(groups, callback_data.rest_id))
-
-            elif callback_data.level == 2:
-                # --- ИСПРАВЛЕНИЕ ЗДЕСЬ ---
-                # Было: cats = await get_categories(session, callback_data.rest_id, callback_data.group_id)
-                # Стало (rest_id убрали):
-                cats = await get_categories(session, callback_data.group_id)
-                await callback.message.edit_text(f"⬇ Выберите категорию:", reply_markup=get_cats_kb(cats, callback_data.rest_id, callback_data.group_id))
+            key = ("item", item.id, is_random, callback_data.rest_id, callback_data.group_id, callback_data.category_id)
+            screen = await render_cache.screen(key, version, lambda: render_item(item, callback_data, is_random))
+            if not await render_cache.edit(callback.message, screen):
+                # Выпало то же блюдо - Telegram даже не спрашиваем
+                await callback.answer("🎲 То же самое!")
+                return
 
-            elif callback_data.level == 3:
-                items = await get_items_by_category(session, callback_data.category_id)
-                await callback.message.edit_text(f"⬇ Выберите блюдо:", reply_markup=get_items_kb(items, callback_data.rest_id, callback_data.group_id, callback_data.category_id))
+        # 3. НАВИГАЦИЯ (из кэша экранов, без запросов к базе)
+        elif callback_data.level in NAV_SCREENS:
+            screen = await nav_screen(callback_data, version)
+            await render_cache.edit(callback.message, screen)
 
         await callback.answer()
     except Exception as e:
-        print(f"Ошибка меню: {e}")
-        await callback.answer("Ошибка навигации", show_alert=True)
\ No newline at end of file
+        # Ошибку гасим здесь, поэтому и считаем сами, а не в HandlerMetricsMiddleware
+        handler_errors.inc(router=user_router.name, handler="menu_navigation", error=type(e).__name__)
+        logger.exception("Ошибка меню (callback %s)", callback.data)
+        await callback.answer("Ошибка навигации", show_alert=True)
+
+# --- 6. INLINE-ПОИСК (@bot борщ) ---
+INLINE_PAGE_SIZE = 20
+
+@user_router.inline_query()
+async def inline_search(query: types.InlineQuery):
+    offset = int(query.offset) if query.offset.isdigit() else 0
+    # Индекс в памяти (database/search.py), в базу не ходим
+    found = await menu_search.search(query.query, limit=offset + INLINE_PAGE_SIZE + 1)
+    page = found[offset:offset + INLINE_PAGE_SIZE]
+
+    results = []
+    for item in page:
+        rest_name = await menu_search.restaurant_name(item.restaurant_id)
+        results.append(types.InlineQueryResultArticle(
+            id=str(item.id),
+            title=item.name,
+            description=f"{rest_name} · {item.price}₽ · {item.calories} ккал",
+            input_message_content=types.InputTextMessageContent(message_text=item_card_text(item)),
+            reply_markup=get_search_result_kb(item),
+        ))
+    next_offset = str(offset + INLINE_PAGE_SIZE) if len(found) > offset + INLINE_PAGE_SIZE else ""
+    await query.answer(results, cache_time=60, next_offset=next_offset)
+
+# --- 7. СОБЕРИ ОБЕД ---
+@user_router.message(F.text == "🎲 Собери обед")
+async def combo_start(message: types.Message):
+    rests = await menu_cache.get_restaurants()
+    await message.answer("🎲 Из какого ресторана собрать обед?", reply_markup=get_combo_rests_kb(rests))
+
+def render_combo(combo, exact: bool, budget: int) -> str:
+    lines = ["🎲 <b>Ваш обед:</b>\n"]
+    for slot_title, item in combo:
+        lines.append(f"{slot_title}: <b>{item.name}</b>\n    💰 {item.price}₽ | {item.calories} ккал | белки {item.proteins}")
+    price = sum(item.price or 0 for _, item in combo)
+    kcal = sum(item.calories or 0 for _, item in combo)
+    protein = sum(item.proteins or 0 for _, item in combo)
+    lines.append(f"\n🏁 <b>ИТОГО: {price:g}₽ | {kcal:g} ккал | белки {protein:g} г</b>")
+    if budget:
+        lines.append(f"Бюджет: до {budget}₽")
+    if not exact:
+        lines.append("⚠️ В норму по калориям и белку не попали - это самый близкий вариант.")
+    return "\n".join(lines)
+
+@user_router.callback_query(ComboCall.filter())
+async def combo_handler(callback: types.CallbackQuery, callback_data: ComboCall, user_id: int):
+    if callback_data.action == "rests":
+        rests = await menu_cache.get_restaurants()
+        await callback.message.edit_text("🎲 Из какого ресторана собрать обед?", reply_markup=get_combo_rests_kb(rests))
+
+    elif callback_data.action == "rest":
+        await callback.message.edit_text(
+            "💰 Сколько готовы потратить?", reply_markup=get_combo_budget_kb(callback_data.rest_id, COMBO_BUDGETS)
+        )
+
+    elif callback_data.action == "make":
+        # Массивы ресторана собраны один раз, "другой вариант" - только новая выборка
+        combo, exact = await combo_composer.compose(callback_data.rest_id, callback_data.budget)
+        if not combo:
+            await callback.answer("Не получилось собрать обед в этот бюджет 🤷‍♂️", show_alert=True)
+            return
+        text = render_combo(combo, exact, callback_data.budget)
+        markup = get_combo_kb(callback_data.rest_id, callback_data.budget, [item.id for _, item in combo])
+        try:
+            await callback.message.edit_text(text, reply_markup=markup)
+        except TelegramBadRequest:
+            await callback.answer("🎲 То же самое!")
+            return
+
+    elif callback_data.action == "order":
+        item_ids = [int(x) for x in callback_data.items.split("-") if x]
+        # Все блюда обеда попадают в одну пачку OrderWriter
+        written = await asyncio.gather(*(order_writer.submit(user_id, item_id) for item_id in item_ids))
+        await callback.answer(f"✅ Обед записан! Блюд: {sum(written)}", show_alert=True)
+        return
+
+    await callback.answer()
@@ -12,12 +12,30 @@ class MenuCall(CallbackData, prefix="m"):
     action: str = "_" 
 
 class OrderCall(CallbackData, prefix="o"):
-    action: str
-    order_id: int
+    action: str # 'delete', 'page'
+    order_id: int = 0
+    page: int = 0
 
-def get_delete_order_kb(order_id):
+# Заказов на одной странице экрана "Мои заказы сегодня"
+ORDERS_PAGE_SIZE = 8
+
+def get_orders_kb(orders, page, pages, start_num=1):
     builder = InlineKeyboardBuilder()
-    builder.add(InlineKeyboardButton(text="❌ Удалить", callback_data=OrderCall(action="delete", order_id=order_id).pack()))
+    for num, order in enumerate(orders, start=start_num):
+        builder.add(InlineKeyboardButton(
+            text=f"❌ {num}. {order.item.name}",
+            callback_data=OrderCall(action="delete", order_id=order.id, page=page).pack()
+        ))
+    builder.adjust(1)
+
+    if pages > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton(text="◀️", callback_data=OrderCall(action="page", page=page - 1).pack()))
+        nav.append(InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data=OrderCall(action="page", page=page).pack()))
+        if page < pages - 1:
+            nav.append(InlineKeyboardButton(text="▶️", callback_data=OrderCall(action="page", page=page + 1).pack()))
+        builder.row(*nav)
     return builder.as_markup()
 
 def get_nav_buttons(builder, level, rest_id=0, group_id=0, category_id=0):
@@ -83,6 +101,49 @@ def get_item_actions_kb(rest_id, group_id, category_id, item_id, is_random=False
     get_nav_buttons(builder, 4, rest_id, nav_group_id, nav_category_id)
     return builder.as_markup()
 
+# Карточка из inline-поиска может оказаться в любом чате: у колбэка тогда нет
+# callback.message, поэтому только кнопка заказа (ей сообщение не нужно)
+def get_search_result_kb(item):
+    builder = InlineKeyboardBuilder()
+    builder.add(InlineKeyboardButton(text="✅ Я взял это (1 шт)", callback_data=MenuCall(
+        level=5, rest_id=item.restaurant_id, group_id=item.group_id, category_id=item.category_id,
+        item_id=item.id, action="order",
+    ).pack()))
+    return builder.as_markup()
+
+# --- СОБЕРИ ОБЕД ---
+class ComboCall(CallbackData, prefix="cmb"):
+    action: str  # 'rests', 'rest', 'make' (и "другой вариант"), 'order'
+    rest_id: int = 0
+    budget: int = 0  # 0 - без ограничения
+    items: str = ""  # id блюд комбо через "-" (для 'order')
+
+def get_combo_rests_kb(restaurants):
+    builder = InlineKeyboardBuilder()
+    for rest in restaurants:
+        builder.add(InlineKeyboardButton(text=rest.name, callback_data=ComboCall(action="rest", rest_id=rest.id).pack()))
+    builder.adjust(2)
+    return builder.as_markup()
+
+def get_combo_budget_kb(rest_id, budgets):
+    builder = InlineKeyboardBuilder()
+    for budget in budgets:
+        builder.add(InlineKeyboardButton(text=f"до {budget}₽", callback_data=ComboCall(action="make", rest_id=rest_id, budget=budget).pack()))
+    builder.add(InlineKeyboardButton(text="💸 Без лимита", callback_data=ComboCall(action="make", rest_id=rest_id).pack()))
+    builder.adjust(len(budgets) or 1, 1)
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=ComboCall(action="rests").pack()))
+    return builder.as_markup()
+
+def get_combo_kb(rest_id, budget, item_ids):
+    builder = InlineKeyboardBuilder()
+    builder.add(InlineKeyboardButton(text="✅ Беру весь обед", callback_data=ComboCall(
+        action="order", rest_id=rest_id, budget=budget, items="-".join(map(str, item_ids))
+    ).pack()))
+    builder.add(InlineKeyboardButton(text="🔄 Другой вариант", callback_data=ComboCall(action="make", rest_id=rest_id, budget=budget).pack()))
+    builder.add(InlineKeyboardButton(text="🔙 Бюджет", callback_data=ComboCall(action="rest", rest_id=rest_id).pack()))
+    builder.adjust(1)
+    return builder.as_markup()
+
 # --- СТАТИСТИКА ---
 class StatsCall(CallbackData, prefix="stats"):
     period: str # 'week', 'month', 'all'
@@ -100,4 +161,28 @@ def get_excel_kb(period):
     builder.add(InlineKeyboardButton(text="📥 Скачать Excel", callback_data=StatsCall(period=period, action="excel").pack()))
     # Кнопка назад к выбору периода
     builder.add(InlineKeyboardButton(text="🔙 Назад", callback_data=StatsCall(period="back", action="view").pack()))
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
+
+# --- АНАЛИТИКА АДМИНА ---
+class AnalyticsCall(CallbackData, prefix="an"):
+    action: str  # 'show', 'refresh', 'xlsx'
+    report: str = "items"
+    period: str = "week"
+    sort: str = "orders"
+
+def get_analytics_kb(report, period, sort, reports: dict, periods: dict, sorts: dict):
+    builder = InlineKeyboardBuilder()
+
+    def button(text, selected, **changes):
+        data = {"action": "show", "report": report, "period": period, "sort": sort, **changes}
+        return InlineKeyboardButton(text=f"• {text}" if selected else text, callback_data=AnalyticsCall(**data).pack())
+
+    builder.row(*(button(name, key == report, report=key) for key, name in reports.items()))
+    builder.row(*(button(name, key == period, period=key) for key, name in periods.items()))
+    if report != "hours":
+        builder.row(*(button(name, key == sort, sort=key) for key, name in sorts.items()))
+    builder.row(
+        InlineKeyboardButton(text="🔄 Обновить", callback_data=AnalyticsCall(action="refresh", report=report, period=period, sort=sort).pack()),
+        InlineKeyboardButton(text="📥 XLSX", callback_data=AnalyticsCall(action="xlsx", report=report, period=period, sort=sort).pack()),
+    )
+    return builder.as_markup()
@@ -0,0 +1,86 @@
+import hashlib
+from collections import OrderedDict
+
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
+
+# Готовые экраны меню: текст + InlineKeyboardMarkup по узлу навигации.
+# Ключ узла - кортеж вида ("cats", rest_id, group_id), валидность - версия
+# menu_cache: после загрузки нового меню все экраны собираются заново.
+# Для каждого сообщения помним хэш последнего показанного экрана, чтобы
+# одинаковое редактирование не уходило в Telegram.
+
+class Screen:
+    __slots__ = ("text", "markup", "digest")
+
+    def __init__(self, text: str, markup: types.InlineKeyboardMarkup | None = None):
+        self.text = text
+        self.markup = markup
+        payload = text if markup is None else text + markup.model_dump_json(exclude_none=True)
+        self.digest = hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+class RenderCache:
+    def __init__(self, max_screens: int = 20_000, max_messages: int = 50_000):
+        self.max_screens = max_screens
+        self.max_messages = max_messages
+        self._version = None
+        self._screens = OrderedDict()  # ключ узла -> Screen, LRU
+        self._shown = OrderedDict()    # (chat_id, message_id) -> digest, LRU
+        self.hits = 0
+        self.misses = 0
+        self.edits = 0
+        self.skipped = 0
+
+    async def screen(self, key: tuple, version: int, build) -> Screen:
+        # build - корутина без аргументов, возвращает (text, markup)
+        if version != self._version:
+            self._screens.clear()
+            self._version = version
+
+        screen = self._screens.get(key)
+        if screen is not None:
+            self.hits += 1
+            self._screens.move_to_end(key)
+            return screen
+
+        self.misses += 1
+        screen = Screen(*await build())
+        # Пока собирали, меню могло смениться - такой экран не сохраняем
+        if version == self._version:
+            self._screens[key] = screen
+            if len(self._screens) > self.max_screens:
+                self._screens.popitem(last=False)
+        return screen
+
+    def remember(self, message: types.Message, screen: Screen):
+        key = (message.chat.id, message.message_id)
+        self._shown[key] = screen.digest
+        self._shown.move_to_end(key)
+        if len(self._shown) > self.max_messages:
+            self._shown.popitem(last=False)
+
+    async def edit(self, message: types.Message, screen: Screen) -> bool:
+        # False - на экране уже то же самое, запрос не отправлялся
+        if self._shown.get((message.chat.id, message.message_id)) == screen.digest:
+            self.skipped += 1
+            return False
+        try:
+            await message.edit_text(screen.text, reply_markup=screen.markup)
+        except TelegramBadRequest as e:
+            # Сообщение изменили в обход кэша (или кэш его уже забыл)
+            if "message is not modified" not in str(e):
+                raise
+            self.remember(message, screen)
+            self.skipped += 1
+            return False
+        self.edits += 1
+        self.remember(message, screen)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits, "misses": self.misses, "screens": len(self._screens),
+            "edits": self.edits, "skipped": self.skipped, "messages": len(self._shown),
+        }
+
+render_cache = RenderCache()
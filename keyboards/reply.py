@@ -7,6 +7,9 @@ admin_main_kb = ReplyKeyboardMarkup(
             KeyboardButton(text="➕ Добавить в текущий"),
             KeyboardButton(text="🆕 Создать новый"),
         ],
+        [
+            KeyboardButton(text="📈 Аналитика")
+        ],
         [
             KeyboardButton(text="❌ Выйти из админки")
         ]
@@ -23,6 +26,7 @@ user_main_kb = ReplyKeyboardMarkup(
             KeyboardButton(text="🛒 Мои заказы сегодня"),
         ],
         [
+            KeyboardButton(text="🎲 Собери обед"),
             KeyboardButton(text="📊 Статистика")
         ]
     ],
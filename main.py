@@ -1,41 +1,117 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
-from aiogram.enums import ParseMode
-from aiogram.client.default import DefaultBotProperties
 
-from config import BOT_TOKEN
-from database.engine import create_db
+# Профиль старта заводим первым, чтобы замерить все остальные импорты
+from utils.startup import startup_profile
+
+with startup_profile.phase("импорт aiogram"):
+    from aiogram import Bot, Dispatcher
+    from aiogram.enums import ParseMode
+    from aiogram.client.default import DefaultBotProperties
+
+with startup_profile.phase("импорт config + database"):
+    from config import BOT_TOKEN, BOT_MODE, DROP_PENDING_UPDATES, METRICS_HOST, METRICS_PORT
+    from database.engine import create_db
+    from database.cache import menu_cache
+    from database.taste import taste_profiles
+    from database.stats_cache import stats_cache
+
+with startup_profile.phase("импорт utils + middlewares"):
+    from utils.executor import cpu_executor
+    from utils.metrics import registry, start_metrics_server
+    from utils.webhook import run_webhook
+    from utils.order_writer import order_writer
+    from middlewares.db import DbSessionMiddleware
+    from middlewares.user import UserMiddleware
+    from middlewares.outbound import outbound_scheduler
+    from middlewares.metrics import UpdateMetricsMiddleware, instrument_router
+    from keyboards.render_cache import render_cache
 
 # Импортируем роутеры
-from handlers.admin_private import admin_router
-from handlers.user_private import user_router
+with startup_profile.phase("импорт handlers.admin_private"):
+    from handlers.admin_private import admin_router
+with startup_profile.phase("импорт handlers.user_private"):
+    from handlers.user_private import user_router
 
 logging.basicConfig(level=logging.INFO)
 
-bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher()
+# Счетчики кэшей и очередей - в /metrics вместе с остальными метриками
+registry.stats_gauge("bot_menu_cache", "Кэш каталога меню", menu_cache.stats)
+registry.stats_gauge("bot_render_cache", "Кэш экранов меню", render_cache.stats)
+registry.stats_gauge("bot_outbound", "Планировщик исходящих запросов", outbound_scheduler.stats)
+# Вложенный словарь из stats() в stats_gauge не попадает - очередь по полосам отдельной метрикой
+registry.gauge(
+    "bot_outbound_queue_depth", "Запросы в очереди планировщика по полосам",
+    lambda: {(lane,): depth for lane, depth in outbound_scheduler.queue_depth_by_lane().items()},
+    labelnames=("lane",),
+)
+registry.stats_gauge("bot_cpu_executor", "Пул тяжелых задач", cpu_executor.stats)
+registry.stats_gauge("bot_order_writer", "Очередь записи заказов", order_writer.stats)
+registry.stats_gauge("bot_taste_profiles", "Профили вкусов для персонального рандома", taste_profiles.stats)
+registry.stats_gauge("bot_stats_cache", "Кэш отчетов статистики (hit_rate, bytes)", stats_cache.stats)
 
-async def on_startup(bot):
-    print("Подключение к базе данных...")
-    await create_db()
-    print("База данных готова!")
+def create_bot() -> Bot:
+    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Все исходящие запросы идут через планировщик с лимитами Telegram
+    bot.session.middleware(outbound_scheduler)
+    return bot
 
-async def main():
+# Роутеры можно подключить только к одному диспетчеру,
+# поэтому create_dispatcher вызывается один раз на процесс
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
     dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    # Время апдейта целиком, включая поиск пользователя
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    # Одна ленивая сессия базы на апдейт (ее же использует UserMiddleware)
+    db_middleware = DbSessionMiddleware()
+    dp.update.outer_middleware(db_middleware)
+    registry.stats_gauge("bot_db_sessions", "Апдейты и открытые для них сессии базы", db_middleware.stats)
+    # Пользователь определяется один раз на апдейт (после встроенного UserContextMiddleware)
+    dp.update.outer_middleware(UserMiddleware())
+    instrument_router(admin_router)
+    instrument_router(user_router)
 
     # --- ВОТ ЭТО САМОЕ ВАЖНОЕ ---
     # Порядок важен! Сначала админ, потом юзер
     dp.include_router(admin_router)
     dp.include_router(user_router)
     # ----------------------------
+    return dp
+
+async def on_startup(bot):
+    print("Подключение к базе данных...")
+    with startup_profile.phase("база данных"):
+        await create_db()
+    print("База данных готова!")
+    # Меню, загруженное через другой воркер, подхватываем по версии в базе
+    menu_cache.start_watch()
+    startup_profile.log()
+
+async def on_shutdown(bot):
+    await menu_cache.stop_watch()
+    # Принятые, но еще не записанные заказы дописываем до выхода
+    await order_writer.drain()
+    cpu_executor.shutdown()
+
+async def main():
+    bot = create_bot()
+    dp = create_dispatcher()
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+    if BOT_MODE == "webhook":
+        await run_webhook(bot, dp)
+        return
 
     print("Бот запущен и готов к работе!") 
-    await bot.delete_webhook(drop_pending_updates=True)
+    # Апдейты, накопившиеся пока бот лежал, по умолчанию не выбрасываем
+    await bot.delete_webhook(drop_pending_updates=DROP_PENDING_UPDATES)
     await dp.start_polling(bot)
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("Бот выключен")
\ No newline at end of file
+        print("Бот выключен")
@@ -0,0 +1,73 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.engine import session_maker
+
+# Одна сессия базы на апдейт. Хендлер получает data["db"] и берет сессию
+# через db.get() только когда действительно идет в базу: навигация по меню,
+# поиск и рандом (всё из снимка в памяти) сессию не открывают вовсе.
+# В конце апдейта незакрытая транзакция фиксируется (или откатывается при
+# ошибке) один раз, и сессия закрывается.
+
+class LazySession:
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._session = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def get(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    async def close(self, commit: bool):
+        session = self._session
+        if session is None:
+            return
+        self._session = None
+        try:
+            if session.in_transaction():
+                if commit:
+                    await session.commit()
+                else:
+                    await session.rollback()
+        finally:
+            await session.close()
+
+class DbSessionMiddleware(BaseMiddleware):
+    def __init__(self, session_factory=session_maker):
+        self.session_factory = session_factory
+        self.updates = 0
+        self.opened = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        db = LazySession(self.session_factory)
+        data["db"] = db
+        self.updates += 1
+        try:
+            result = await handler(event, data)
+        except BaseException:
+            if db.opened:
+                self.opened += 1
+            await db.close(commit=False)
+            raise
+        if db.opened:
+            self.opened += 1
+        await db.close(commit=True)
+        return result
+
+    def stats(self) -> dict:
+        return {"updates": self.updates, "sessions_opened": self.opened}
@@ -0,0 +1,94 @@
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Router
+from aiogram.types import TelegramObject, Update
+
+from config import SLOW_UPDATE_MS
+from utils.metrics import (
+    handler_seconds, handler_errors, update_seconds, slow_updates, current_trace, UpdateTrace,
+)
+
+logger = logging.getLogger("bot.slow_updates")
+
+# Два уровня: UpdateMetricsMiddleware (outer, на весь апдейт) заводит трассу,
+# HandlerMetricsMiddleware (inner, на каждом роутере) меряет сам хендлер и
+# считает его ошибки. Медленные апдейты пишутся в лог одной JSON-строкой
+# с разбивкой по SQL-запросам.
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    def __init__(self, slow_ms: float = SLOW_UPDATE_MS):
+        self.slow_ms = slow_ms
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        trace = UpdateTrace()
+        token = current_trace.set(trace)
+        try:
+            return await handler(event, data)
+        finally:
+            current_trace.reset(token)
+            elapsed = time.perf_counter() - trace.started
+            update_type = event.event_type
+            update_seconds.observe(elapsed, type=update_type)
+            if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+                slow_updates.inc(type=update_type)
+                self.log_slow(event, trace, elapsed)
+
+    @staticmethod
+    def log_slow(event: Update, trace: UpdateTrace, elapsed: float):
+        queries = sorted(trace.queries.items(), key=lambda kv: kv[1][1], reverse=True)
+        user = getattr(event.event, "from_user", None)
+        record = {
+            "update_id": event.update_id,
+            "type": event.event_type,
+            "user": user.id if user else None,
+            "router": trace.router,
+            "handler": trace.handler,
+            "total_ms": round(elapsed * 1000, 1),
+            "db_ms": round(sum(s for _, s in trace.queries.values()) * 1000, 1),
+            "queries": [
+                {"statement": label, "count": count, "ms": round(seconds * 1000, 1)}
+                for label, (count, seconds) in queries
+            ],
+        }
+        logger.warning("slow_update %s", json.dumps(record, ensure_ascii=False))
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    def __init__(self, router_name: str):
+        self.router_name = router_name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+        trace = current_trace.get()
+        if trace is not None:
+            trace.router, trace.handler = self.router_name, name
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            handler_errors.inc(router=self.router_name, handler=name, error=type(e).__name__)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, router=self.router_name, handler=name)
+
+def instrument_router(router: Router):
+    # Inner middleware срабатывает только когда хендлер найден, поэтому
+    # вешаем его на все типы событий роутера
+    middleware = HandlerMetricsMiddleware(router.name)
+    for event_name, observer in router.observers.items():
+        if event_name != "error":
+            observer.middleware(middleware)
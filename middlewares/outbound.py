@@ -0,0 +1,207 @@
+import asyncio
+import itertools
+import logging
+from time import monotonic
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from config import (
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_GROUP_RATE,
+    OUTBOUND_MAX_RETRIES, WEBHOOK_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Планировщик исходящих запросов к Bot API: token bucket на весь бот и на
+# каждый чат, приоритетные полосы (ответы на колбэки первыми, документы
+# последними) и автоматический повтор после RetryAfter.
+
+# Полосы: чем меньше число, тем раньше уходит запрос
+LANE_CALLBACK, LANE_DEFAULT, LANE_BULK = 0, 1, 2
+LANE_NAMES = {LANE_CALLBACK: "callback", LANE_DEFAULT: "default", LANE_BULK: "bulk"}
+
+BULK_METHODS = {"SendDocument", "SendPhoto", "SendVideo", "SendAudio", "SendMediaGroup", "SendAnimation", "SendVoice"}
+CALLBACK_METHODS = {"AnswerCallbackQuery", "AnswerInlineQuery"}
+# Лимиты Telegram касаются отправки и правки сообщений; getUpdates, getFile и т.п. не ограничиваем
+LIMITED_PREFIXES = ("Send", "Edit", "Answer", "Copy", "Forward", "DeleteMessage")
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self, now: float) -> float:
+        # Сколько ждать до следующего токена (0 - можно отправлять)
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def block(self, until: float):
+        self.blocked_until = max(self.blocked_until, until)
+
+class OutboundScheduler(BaseRequestMiddleware):
+    def __init__(
+        self,
+        global_rate: float = OUTBOUND_GLOBAL_RATE,
+        chat_rate: float = OUTBOUND_CHAT_RATE,
+        chat_burst: int = OUTBOUND_CHAT_BURST,
+        group_rate: float = OUTBOUND_GROUP_RATE,
+        max_retries: int = OUTBOUND_MAX_RETRIES,
+        max_chats: int = 10_000,
+    ):
+        self._global = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._chats = {}
+        self._waiters = []  # [lane, seq, chat_id, future, enqueued_at]
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._pump_task = None
+
+        self.sent = 0
+        self.retries = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    # --- МЕТРИКИ ---
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def queue_depth_by_lane(self) -> dict:
+        depth = {name: 0 for name in LANE_NAMES.values()}
+        for lane, *_ in self._waiters:
+            depth[LANE_NAMES[lane]] += 1
+        return depth
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_depth_by_lane": self.queue_depth_by_lane(),
+            "sent": self.sent,
+            "retries": self.retries,
+            "wait_avg_ms": self.wait_total / self.sent * 1000 if self.sent else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+
+    # --- ПЛАНИРОВАНИЕ ---
+    @staticmethod
+    def lane(method) -> int:
+        name = type(method).__name__
+        if name in CALLBACK_METHODS:
+            return LANE_CALLBACK
+        if name in BULK_METHODS:
+            return LANE_BULK
+        return LANE_DEFAULT
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chats:
+                # Выкидываем чаты, которые уже накопили полный запас токенов
+                now = monotonic()
+                for key in [k for k, b in self._chats.items() if b.delay(now) == 0 and b.tokens >= b.capacity]:
+                    del self._chats[key]
+            # Личный чат - положительный id; группы и каналы - отрицательный или @username
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            else:
+                bucket = TokenBucket(self.group_rate, 1)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _acquire(self, lane: int, chat_id):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        future = asyncio.get_running_loop().create_future()
+        entry = [lane, next(self._seq), chat_id, future, monotonic()]
+        self._waiters.append(entry)
+        self._wakeup.set()
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        try:
+            await future
+        except asyncio.CancelledError:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            raise
+
+        waited = monotonic() - entry[4]
+        self.sent += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    async def _pump(self):
+        # Единственная задача, которая раздает токены ожидающим запросам
+        while self._waiters:
+            self._wakeup.clear()
+            now = monotonic()
+            sleep_for = self._global.delay(now)
+            if sleep_for == 0:
+                chosen = None
+                sleep_for = float("inf")
+                for entry in self._waiters:
+                    chat_id = entry[2]
+                    delay = 0.0 if chat_id is None else self._chat_bucket(chat_id).delay(now)
+                    if delay == 0:
+                        if chosen is None or entry[:2] < chosen[:2]:
+                            chosen = entry
+                    else:
+                        sleep_for = min(sleep_for, delay)
+                if chosen is not None:
+                    self._waiters.remove(chosen)
+                    self._global.consume()
+                    if chosen[2] is not None:
+                        self._chat_bucket(chosen[2]).consume()
+                    if not chosen[3].done():
+                        chosen[3].set_result(None)
+                    continue
+
+            # Ждем токен или нового ожидающего (он может быть из свободного чата)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_for)
+            except asyncio.TimeoutError:
+                pass
+
+    async def __call__(self, make_request, bot, method):
+        limited = type(method).__name__.startswith(LIMITED_PREFIXES)
+        chat_id = getattr(method, "chat_id", None)
+        lane = self.lane(method)
+
+        for attempt in range(self.max_retries + 1):
+            if limited:
+                await self._acquire(lane, chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                logger.warning("RetryAfter %s с для %s (чат %s)", e.retry_after, type(method).__name__, chat_id)
+                until = monotonic() + e.retry_after
+                # Флуд в конкретном чате блокирует только его, иначе - весь бот
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).block(until)
+                else:
+                    self._global.block(until)
+                if not limited:
+                    await asyncio.sleep(e.retry_after)
+
+# Общий лимит бота делится между процессами-воркерами webhook-режима
+outbound_scheduler = OutboundScheduler(global_rate=OUTBOUND_GLOBAL_RATE / max(WEBHOOK_WORKERS, 1))
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from config import USER_CACHE_SIZE
+from database.engine import session_maker
+from database.orm import add_user
+
+# Один раз на апдейт находим (или создаем) пользователя и кладем его
+# внутренний id в data["user_id"]. Хендлеры и orm-функции работают с ним
+# напрямую, без select(User) на каждое действие.
+
+class UserMiddleware(BaseMiddleware):
+    def __init__(self, max_size: int = USER_CACHE_SIZE):
+        self.max_size = max_size
+        self._cache = OrderedDict()  # telegram_id -> users.id, LRU
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, telegram_id: int, username: str, db=None) -> int:
+        user_id = self._cache.get(telegram_id)
+        if user_id is not None:
+            self.hits += 1
+            self._cache.move_to_end(telegram_id)
+            return user_id
+
+        self.misses += 1
+        if db is not None:
+            # Сессия апдейта из DbSessionMiddleware
+            user = await add_user(db.get(), telegram_id, username)
+        else:
+            async with session_maker() as session:
+                user = await add_user(session, telegram_id, username)
+        self._cache[telegram_id] = user.id
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return user.id
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        # event_from_user заполняет встроенный UserContextMiddleware диспетчера
+        tg_user = data.get("event_from_user")
+        if tg_user is not None and not tg_user.is_bot:
+            data["user_id"] = await self.resolve(tg_user.id, tg_user.username, data.get("db"))
+        return await handler(event, data)
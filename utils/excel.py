@@ -0,0 +1,190 @@
+import csv
+import io
+import os
+
+# Синхронные функции для работы с Excel. Вызываются через cpu_executor,
+# поэтому должны быть на уровне модуля (для пула процессов нужен pickle).
+# openpyxl импортируется внутри функций: большинству запусков бота
+# файлы не нужны, и платить за импорт на старте незачем. pandas не используется.
+# Файл приходит байтами из памяти, временных файлов на диске нет.
+
+TEXT_COLUMNS = ['Группа', 'Категория', 'Название блюда', 'Состав', 'Вес']
+NUM_COLUMNS = ['Калории', 'Белки', 'Жиры', 'Углеводы', 'Цена']
+REQUIRED_COLUMNS = ['Название блюда', 'Цена']
+# Пустая группа/категория - не ошибка, блюдо попадает в раздел по умолчанию
+TEXT_DEFAULTS = {'Группа': 'Разное', 'Категория': 'Общее'}
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    # Целые числа из Excel приходят как float: 250.0 -> "250"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+def _number(value) -> float:
+    # Пустая ячейка - 0, не число - NaN (станет ошибкой строки при проверке)
+    if value is None or value == '':
+        return 0.0
+    if isinstance(value, bool):
+        return float('nan')
+    if isinstance(value, (int, float)):
+        return float(value) if value == value else 0.0  # NaN из Excel - пустая ячейка
+    # "1 200,50" -> 1200.5: пробелы-разделители тысяч и запятая вместо точки
+    text = str(value).strip().replace('\xa0', '').replace(' ', '').replace(',', '.')
+    if not text:
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        return float('nan')
+
+def is_csv(filename: str) -> bool:
+    return os.path.splitext(filename or '')[1].lower() == '.csv'
+
+def _read_xlsx(data: bytes, sheet: str = None):
+    from openpyxl import load_workbook
+
+    # read_only: строки читаются потоком, без модели всей книги в памяти
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def _read_csv(data: bytes):
+    # Excel в русской локали сохраняет CSV в cp1251 и через ";"
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('cp1251')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=';,\t')
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(io.StringIO(text, newline=''), dialect)
+
+def list_sheets(data: bytes, filename: str) -> list:
+    """Имена листов книги; у CSV один безымянный лист (None)."""
+    if is_csv(filename):
+        return [None]
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(data), read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+def _validate(columns: dict, line_numbers: list) -> tuple:
+    # Проверка по колонкам листа. Ячейки - разнотипные объекты Python (числа из
+    # openpyxl, строки из CSV), так что разбор все равно поштучный: один проход на колонку
+    bad = set()  # индексы строк с ошибками
+    problems = []  # (индекс строки, текст ошибки)
+
+    for i, name in enumerate(columns['Название блюда']):
+        if not name:
+            problems.append((i, "нет названия блюда"))
+            bad.add(i)
+
+    for col in NUM_COLUMNS:
+        raw = columns[col]
+        values = [_number(v) for v in raw]
+        for i, value in enumerate(values):
+            if value != value:  # NaN
+                problems.append((i, f"{col}: «{raw[i]}» - не число"))
+                bad.add(i)
+            elif value < 0:
+                problems.append((i, f"{col}: отрицательное значение {value:g}"))
+                bad.add(i)
+        columns[col] = values
+
+    for col, default in TEXT_DEFAULTS.items():
+        columns[col] = [value or default for value in columns[col]]
+
+    keys = TEXT_COLUMNS + NUM_COLUMNS
+    items = [
+        dict(zip(keys, row))
+        for i, row in enumerate(zip(*(columns[k] for k in keys))) if i not in bad
+    ]
+    errors = sorted(((line_numbers[i], text) for i, text in problems), key=lambda e: e[0])
+    return items, errors
+
+def parse_menu_sheet(data: bytes, filename: str, sheet: str = None) -> dict:
+    """Один лист (или CSV) -> {"sheet", "items", "errors", "rows"}.
+    errors - список (номер строки в файле, текст); строки с ошибками в items не попадают."""
+    rows = _read_csv(data) if is_csv(filename) else _read_xlsx(data, sheet)
+    result = {"sheet": sheet, "items": [], "errors": [], "rows": 0}
+
+    header = next(rows, None)
+    if header is None:
+        return result
+    header = [_text(name) for name in header]
+    missing = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing:
+        result["errors"] = [(1, f"нет колонки «{col}»") for col in missing]
+        return result
+
+    # Раскладываем по колонкам одним проходом по строкам; лишние колонки не читаем
+    positions = {col: header.index(col) for col in TEXT_COLUMNS + NUM_COLUMNS if col in header}
+    columns = {col: [] for col in TEXT_COLUMNS + NUM_COLUMNS}
+    line_numbers = []
+    for line, row in enumerate(rows, start=2):
+        # Полностью пустые строки (часто в конце листа) пропускаем
+        if all(value is None or value == '' for value in row):
+            continue
+        line_numbers.append(line)
+        width = len(row)
+        for col, values in columns.items():
+            pos = positions.get(col)
+            # Короткие строки CSV: недостающие колонки как пустые ячейки
+            value = row[pos] if pos is not None and pos < width else None
+            values.append(_text(value) if col in TEXT_COLUMNS else value)
+
+    result["rows"] = len(line_numbers)
+    if line_numbers:
+        result["items"], result["errors"] = _validate(columns, line_numbers)
+    return result
+
+STATS_COLUMNS = ["Дата", "Ресторан", "Категория", "Блюдо", "Цена", "Калории", "Белки", "Жиры", "Углеводы"]
+
+class StatsWorkbookWriter:
+    """Потоковая запись отчета: openpyxl в write-only режиме сбрасывает строки
+    на диск по мере добавления, книга целиком в памяти не держится."""
+
+    def __init__(self):
+        self._wb = None
+        self._ws = None
+        self.rows = 0
+
+    def append_rows(self, rows):
+        # Книгу создаем на первой пачке: пустой отчет не оставляет временных файлов
+        if self._ws is None:
+            from openpyxl import Workbook
+            self._wb = Workbook(write_only=True)
+            self._ws = self._wb.create_sheet('Статистика')
+            self._ws.append(STATS_COLUMNS)
+        # Строка: (created, ресторан, категория, блюдо, цена, ккал, белки, жиры, углеводы)
+        for created, *rest in rows:
+            self._ws.append([created.strftime("%Y-%m-%d %H:%M"), *rest])
+        self.rows += len(rows)
+
+    def save(self, path: str):
+        self._wb.save(path)
+
+REPORT_COLUMNS = ["Название", "Заказов", "Выручка", "Средний чек"]
+
+def build_report_workbook(sheets: list) -> bytes:
+    """sheets - список (название листа, строки (название, заказы, выручка)); результат - байты xlsx."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for title, rows in sheets:
+        ws = wb.create_sheet(title[:31])  # длиннее Excel не разрешает
+        ws.append(REPORT_COLUMNS)
+        for name, orders, revenue in rows:
+            ws.append([name, orders, round(revenue, 2), round(revenue / orders, 2) if orders else 0])
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
@@ -0,0 +1,75 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from config import EXECUTOR_MODE, EXECUTOR_WORKERS, EXECUTOR_QUEUE_LIMIT
+
+# Тяжелые синхронные задачи (openpyxl, csv) выполняем вне event loop,
+# чтобы загрузка большого файла админом не тормозила колбэки остальных.
+
+class ExecutorBusy(Exception):
+    """Очередь задач заполнена, новую не принимаем."""
+
+class CpuExecutor:
+    def __init__(self, mode: str = EXECUTOR_MODE, workers: int = EXECUTOR_WORKERS, queue_limit: int = EXECUTOR_QUEUE_LIMIT):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Неизвестный режим пула: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._pool = None
+        self._semaphore = asyncio.Semaphore(workers)
+        self.running = 0
+        self.waiting = 0
+
+    def _get_pool(self):
+        # Пул создаем при первой задаче: большинство запусков бота его не трогают
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+        return self._pool
+
+    def admit(self):
+        """ExecutorBusy, если очередь заполнена."""
+        if self.waiting >= self.queue_limit and self.running >= self.workers:
+            raise ExecutorBusy()
+
+    async def run(self, func, *args, **kwargs):
+        # В режиме "process" func и аргументы должны сериализоваться через pickle
+        self.admit()
+        return await self._submit(self._get_pool(), func, *args, **kwargs)
+
+    async def run_in_thread(self, func, *args, **kwargs):
+        # Для задач из нескольких шагов над одним объектом (книга openpyxl между
+        # пачками строк): в процесс его не передать, поэтому шаг всегда идет в
+        # потоке, но занимает слот пула наравне с остальными. Очередь не
+        # проверяется - начатую задачу не обрываем, admit() вызывают перед ней
+        pool = None if self.mode == "process" else self._get_pool()
+        return await self._submit(pool, func, *args, **kwargs)
+
+    async def _submit(self, pool, func, *args, **kwargs):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "running": self.running, "waiting": self.waiting}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+cpu_executor = CpuExecutor()
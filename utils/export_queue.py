@@ -0,0 +1,64 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from config import EXPORT_MAX_RUNNING
+
+# Очередь выгрузок: одинаковые запросы (пользователь, период) склеиваются в
+# одну задачу, а одновременно выполняется не больше EXPORT_MAX_RUNNING задач.
+# Задача возвращает путь к временному файлу (или None), файл удаляется,
+# когда его отправили все, кто ждал.
+
+def _remove_result(task: asyncio.Task):
+    if task.cancelled() or task.exception() is not None:
+        return
+    path = task.result()
+    if path and os.path.exists(path):
+        os.remove(path)
+
+class _Job:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class ExportQueue:
+    def __init__(self, max_running: int = EXPORT_MAX_RUNNING):
+        self._semaphore = asyncio.Semaphore(max_running)
+        self._jobs = {}
+        self.started = 0
+        self.merged = 0
+
+    async def _run(self, factory):
+        async with self._semaphore:
+            return await factory()
+
+    @property
+    def queued(self) -> int:
+        return len(self._jobs)
+
+    @asynccontextmanager
+    async def job(self, key, factory):
+        job = self._jobs.get(key)
+        if job is None:
+            job = _Job(asyncio.create_task(self._run(factory)))
+            self._jobs[key] = job
+            self.started += 1
+        else:
+            self.merged += 1
+
+        job.waiters += 1
+        try:
+            # shield: отмена одного ожидающего не должна отменять общую задачу
+            yield await asyncio.shield(job.task)
+        finally:
+            job.waiters -= 1
+            if job.waiters == 0:
+                if self._jobs.get(key) is job:
+                    del self._jobs[key]
+                if job.task.done():
+                    _remove_result(job.task)
+                else:
+                    # Все ожидающие отменены, а задача еще идет: уберем файл по ее завершении
+                    job.task.add_done_callback(_remove_result)
+
+export_queue = ExportQueue()
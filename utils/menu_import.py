@@ -0,0 +1,32 @@
+import asyncio
+
+from utils.executor import cpu_executor
+from utils.excel import list_sheets, parse_menu_sheet
+
+# Загрузка меню сетью: каждый лист книги - отдельный ресторан.
+# Листы разбираются параллельно в cpu_executor (не больше, чем в пуле воркеров,
+# чтобы 30 листов не упирались в EXECUTOR_QUEUE_LIMIT), а готовые листы
+# отдаются по мере разбора - запись в базу первого листа идет, пока разбираются
+# остальные.
+
+async def iter_menu_sheets(data: bytes, filename: str):
+    """Асинхронно выдает результаты parse_menu_sheet в порядке готовности.
+    К результату добавляются "index" листа и "sheets" - сколько листов в файле."""
+    sheets = await cpu_executor.run(list_sheets, data, filename)
+    limit = asyncio.Semaphore(cpu_executor.workers)
+
+    async def parse(index: int, sheet: str):
+        async with limit:
+            result = await cpu_executor.run(parse_menu_sheet, data, filename, sheet)
+        result["index"] = index
+        result["sheets"] = len(sheets)
+        return result
+
+    tasks = [asyncio.create_task(parse(index, sheet)) for index, sheet in enumerate(sheets)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Ошибка записи в базу или отмена - недоразобранные листы не нужны
+        for task in tasks:
+            task.cancel()
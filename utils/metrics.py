@@ -0,0 +1,197 @@
+import bisect
+import contextvars
+import math
+import time
+
+from aiohttp import web
+
+# Метрики в текстовом формате Prometheus без внешних зависимостей.
+# Всё живет в памяти процесса; при нескольких воркерах у каждого свой /metrics.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+class Gauge(Metric):
+    """Значение считывается в момент запроса /metrics из функции."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, func, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        # func() -> число или {значения меток (кортеж): число}
+        self._func = func
+
+    def render(self) -> list:
+        value = self._func()
+        if not isinstance(value, dict):
+            return [f"{self.name} {_number(value)}"]
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in value.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # метки -> [счетчики по корзинам..., сумма, количество]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        row = self._values.get(key)
+        if row is None:
+            row = self._values[key] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            row[index] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def render(self) -> list:
+        lines = []
+        for key, row in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                le = _labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {row[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(row[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, func, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, func, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def stats_gauge(self, name, documentation, stats):
+        # Готовые словари stats() кэшей и планировщиков: каждый ключ - значение метки "key"
+        def collect():
+            return {(k,): v for k, v in stats().items() if isinstance(v, (int, float))}
+        return self.gauge(name, documentation, collect, labelnames=("key",))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                body = metric.render()
+            except Exception:
+                # Сломанный сборщик не должен ронять весь /metrics
+                continue
+            lines += metric.header() + body
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# --- МЕТРИКИ БОТА ---
+handler_seconds = registry.histogram(
+    "bot_handler_seconds", "Время работы хендлера", ("router", "handler"),
+)
+handler_errors = registry.counter(
+    "bot_handler_errors_total", "Необработанные ошибки в хендлерах", ("router", "handler", "error"),
+)
+update_seconds = registry.histogram(
+    "bot_update_seconds", "Полное время обработки апдейта", ("type",),
+)
+slow_updates = registry.counter(
+    "bot_slow_updates_total", "Апдейты дольше SLOW_UPDATE_MS", ("type",),
+)
+db_query_seconds = registry.histogram(
+    "bot_db_query_seconds", "Время SQL-запроса (по типу запроса и таблице)", ("statement",), buckets=DB_BUCKETS,
+)
+db_query_errors = registry.counter(
+    "bot_db_query_errors_total", "SQL-запросы, завершившиеся ошибкой", ("statement",),
+)
+
+# --- ТРАССИРОВКА АПДЕЙТА ---
+# Разбивка по запросам текущего апдейта: метка запроса -> [количество, секунды].
+# Заполняется хуками SQLAlchemy (database/instrumentation.py); greenlet-ы
+# SQLAlchemy наследуют контекст, поэтому contextvar виден и внутри них.
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+class UpdateTrace:
+    __slots__ = ("started", "handler", "router", "queries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.handler = None
+        self.router = None
+        self.queries = {}
+
+    def add_query(self, statement: str, seconds: float):
+        row = self.queries.get(statement)
+        if row is None:
+            self.queries[statement] = [1, seconds]
+        else:
+            row[0] += 1
+            row[1] += seconds
+
+# --- HTTP ---
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
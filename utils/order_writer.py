@@ -0,0 +1,116 @@
+import asyncio
+import logging
+
+from config import ORDER_BATCH_SIZE, ORDER_BATCH_MS
+from database.engine import session_maker, durable_session
+from database.orm import add_orders
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Запись заказов пачками (write-behind). Нажатие "✅ Я взял это" кладет заказ
+# в очередь и ждет; одна фоновая задача раз в ORDER_BATCH_MS (или как только
+# набралось ORDER_BATCH_SIZE заказов) пишет всю пачку одной транзакцией.
+# Ответ пользователю уходит только после commit его пачки. Пачка пишется
+# через durable_session: в SQLite commit идет с synchronous=FULL (остальные
+# запросы бота - с NORMAL), так что подтвержденный заказ переживет и
+# отключение питания. Это один fsync на пачку вместо одного на заказ.
+
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+order_batch_size = registry.histogram(
+    "bot_order_batch_size", "Заказов в одной транзакции OrderWriter", buckets=BATCH_BUCKETS,
+)
+order_batch_seconds = registry.histogram(
+    "bot_order_batch_seconds", "Время записи пачки заказов",
+)
+
+class WriterClosed(Exception):
+    pass
+
+class OrderWriter:
+    def __init__(self, session_factory=session_maker, max_batch: int = ORDER_BATCH_SIZE, max_delay_ms: float = ORDER_BATCH_MS):
+        self._session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._pending = []  # (user_id, item_id, quantity, future)
+        self._wakeup = None
+        self._full = None
+        self._task = None
+        self._closed = False
+        self.batches = 0
+        self.written = 0
+
+    def _ensure_started(self):
+        if self._task is None:
+            # События создаем внутри работающего loop (воркеры webhook - свой loop)
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, user_id: int, item_id: int, quantity: int = 1) -> bool:
+        """Ждет, пока заказ будет записан. False - такого блюда нет."""
+        if self._closed:
+            raise WriterClosed("Запись заказов остановлена")
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((user_id, item_id, quantity, future))
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        # shield: пользователь мог уйти, но заказ из пачки уже не выкинуть
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._pending and self._closed:
+                return
+            # Копим пачку: до таймаута или до заполнения
+            if len(self._pending) < self.max_batch and not self._closed:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            if len(self._pending) < self.max_batch:
+                self._full.clear()
+            if not self._pending and not self._closed:
+                self._wakeup.clear()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            async with durable_session(self._session_factory) as session:
+                written = await add_orders(session, [(u, i, q) for u, i, q, _ in batch])
+        except Exception as e:
+            logger.exception("Не удалось записать пачку из %s заказов", len(batch))
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        order_batch_size.observe(len(batch))
+        order_batch_seconds.observe(loop.time() - started)
+        self.batches += 1
+        self.written += sum(written)
+        for (*_, future), ok in zip(batch, written):
+            if not future.done():
+                future.set_result(ok)
+
+    async def drain(self):
+        # Новые заказы больше не принимаем, уже принятые дописываем
+        self._closed = True
+        if self._task is None:
+            return
+        self._wakeup.set()
+        self._full.set()
+        await self._task
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "batches": self.batches, "written": self.written}
+
+order_writer = OrderWriter()
@@ -0,0 +1,56 @@
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("bot.startup")
+
+# Профиль холодного старта: сколько заняли импорты модулей бота и подготовка
+# базы, какие тяжелые библиотеки уже загружены. Печатается одной таблицей
+# в конце on_startup. Время до первого обработанного апдейта меряет
+# benchmarks/bench_startup.py.
+
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl")
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # (название, секунды)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self) -> dict:
+        rss = _max_rss_mb()
+        return {
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases},
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+            "max_rss_mb": round(rss, 1) if rss is not None else None,
+        }
+
+    def log(self):
+        report = self.report()
+        lines = [f"  {name:<28} {ms:>8.1f} мс" for name, ms in report["phases_ms"].items()]
+        lines.append(f"  {'итого до готовности':<28} {report['total_ms']:>8.1f} мс")
+        heavy = ", ".join(report["heavy_modules"]) or "нет"
+        logger.info(
+            "Профиль старта:\n%s\n  тяжелые модули загружены: %s, пик RSS: %s МБ",
+            "\n".join(lines), heavy, report["max_rss_mb"],
+        )
+
+startup_profile = StartupProfile()
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+
+from config import (
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_MAX_CONCURRENCY, WEBHOOK_WORKERS, DROP_PENDING_UPDATES, METRICS_HOST, METRICS_PORT,
+)
+from utils.metrics import metrics_handler, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+# Webhook-режим. Один процесс слушает порт и принимает апдейты от Telegram.
+# При WEBHOOK_WORKERS = 1 апдейты обрабатываются здесь же, при WEBHOOK_WORKERS > 1
+# раздаются по процессам-воркерам по id пользователя, чтобы FSM-состояние
+# (MemoryStorage) одного пользователя всегда жило в одном процессе.
+# Кэши в памяти у каждого воркера свои. Меню общее для всех, поэтому
+# menu_cache сверяет версию меню в базе (database/cache.py) и сбрасывается
+# после загрузки в любом воркере. Кэши пользователя (статистика, вкусы,
+# история рандома) меняются только его же заказами, а они идут в его воркер.
+
+def update_user_key(update: dict) -> int:
+    # Апдейт содержит update_id и ровно один объект события
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        user = event.get("from") or event.get("user") or event.get("chat") or {}
+        if "id" in user:
+            return user["id"]
+    return update.get("update_id", 0)
+
+class ConcurrentUpdateProcessor:
+    """Обрабатывает апдейты фоновыми задачами, не больше max_concurrency одновременно."""
+
+    def __init__(self, bot: Bot, dp: Dispatcher, max_concurrency: int = WEBHOOK_MAX_CONCURRENCY):
+        self.bot = bot
+        self.dp = dp
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+
+    async def submit(self, update: dict):
+        # Ждем свободный слот: при перегрузке Telegram просто придержит следующие апдейты
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, update: dict):
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception:
+            logger.exception("Ошибка обработки апдейта %s", update.get("update_id"))
+        finally:
+            self._semaphore.release()
+
+    async def drain(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+# --- ВОРКЕРЫ ---
+def _worker_main(index: int, updates):
+    # Точка входа процесса-воркера: свой бот, свой диспетчер, свой event loop
+    from main import create_bot, create_dispatcher
+    asyncio.run(_worker_loop(index, updates, create_bot(), create_dispatcher()))
+
+async def _worker_loop(index: int, updates, bot: Bot, dp: Dispatcher):
+    processor = ConcurrentUpdateProcessor(bot, dp)
+    loop = asyncio.get_running_loop()
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    # Метрики у каждого воркера свои, на соседних портах
+    metrics = await start_metrics_server(METRICS_HOST, METRICS_PORT + 1 + index) if METRICS_PORT else None
+    logger.info("Воркер %s запущен", index)
+    try:
+        while True:
+            update = await loop.run_in_executor(None, updates.get)
+            if update is None:
+                break
+            await processor.submit(update)
+    finally:
+        await processor.drain()
+        if metrics is not None:
+            await metrics.cleanup()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await bot.session.close()
+
+class WorkerPool:
+    def __init__(self, workers: int, queue_size: int):
+        ctx = multiprocessing.get_context("spawn")
+        self._queues = [ctx.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._processes = [
+            ctx.Process(target=_worker_main, args=(i, q), name=f"bot-worker-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+
+    def route(self, update: dict) -> bool:
+        # Один и тот же пользователь -> одна и та же очередь
+        target = self._queues[update_user_key(update) % len(self._queues)]
+        try:
+            target.put_nowait(update)
+        except queue.Full:
+            return False
+        return True
+
+    def stop(self, timeout: float = 30):
+        for q in self._queues:
+            q.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+# --- HTTP ---
+def create_app(accept) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return web.Response(status=401)
+        accepted = await accept(await request.json())
+        # Не 2xx - Telegram повторит доставку позже
+        return web.Response(status=200 if accepted else 503)
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle)
+    app.router.add_get("/metrics", metrics_handler)
+    return app
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    if not WEBHOOK_BASE_URL:
+        raise RuntimeError("Для BOT_MODE=webhook нужен WEBHOOK_BASE_URL")
+
+    pool = None
+    if WEBHOOK_WORKERS > 1:
+        # Схему готовим один раз здесь, до запуска воркеров
+        await dp.emit_startup(bot=bot, **dp.workflow_data)
+        pool = WorkerPool(WEBHOOK_WORKERS, queue_size=WEBHOOK_MAX_CONCURRENCY * 4)
+        pool.start()
+
+        async def accept(update: dict) -> bool:
+            return pool.route(update)
+    else:
+        processor = ConcurrentUpdateProcessor(bot, dp)
+        await dp.emit_startup(bot=bot, **dp.workflow_data)
+
+        async def accept(update: dict) -> bool:
+            await processor.submit(update)
+            return True
+
+    runner = web.AppRunner(create_app(accept))
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+
+    await bot.set_webhook(
+        url=WEBHOOK_BASE_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET or None,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=DROP_PENDING_UPDATES,
+        max_connections=min(WEBHOOK_MAX_CONCURRENCY * max(WEBHOOK_WORKERS, 1), 100),
+    )
+    print(f"Бот слушает webhook на {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}, воркеров: {WEBHOOK_WORKERS}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        if pool is not None:
+            pool.stop()
+        else:
+            await processor.drain()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await bot.session.close()